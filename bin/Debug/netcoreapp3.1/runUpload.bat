@@ -1,2 +1,2 @@
 call %~dp0\testData\virt\Scripts\activate.bat
-python %~dp0\testData\testdata.py %1 %2 %3 %4 %5
+python %~dp0\testData\testdata.py %*
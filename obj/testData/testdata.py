@@ -1,9 +1,20 @@
 # Standard packages
+import argparse
+import asyncio
+import concurrent.futures
+import csv
 import datetime
 import getpass
+import json
 import logging
+import math
+import os
+import queue
+import re
 import signal
 import sys
+import threading
+import time
 import tkinter
 import tkinter.filedialog
 
@@ -11,9 +22,145 @@ import tkinter.filedialog
 from openpyxl import Workbook, load_workbook
 from simple_salesforce import Salesforce, format_soql
 
-
-def main(filePath = sys.argv[1], username = sys.argv[2], password = sys.argv[3], token = sys.argv[4], createUsers = sys.argv[5]):
-
+# Optional community packages, only needed for --transport async
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Directory (relative to the current directory, like result.log) where per-org metadata is cached between runs
+CACHE_DIRECTORY = "cache"
+# How long a cached sObject describe is trusted before it is fetched from the org again
+DESCRIBE_CACHE_MAX_AGE = datetime.timedelta(days=1)
+# Field types whose values are sent as text
+TEXT_FIELD_TYPES = {'string', 'textarea', 'phone', 'email', 'url', 'picklist', 'multipicklist', 'combobox',
+                    'encryptedstring', 'reference', 'id'}
+
+# Share of the org's remaining daily API requests and bulk batches a run may use unless --api-share is given
+DEFAULT_API_SHARE = 0.5
+# Number of records sent in each bulk API batch
+BATCH_SIZE = 100
+# How long to pause when the API budget is used up before checking the org's limits again, and how many times to do so
+LIMIT_WAIT_SECONDS = 300
+LIMIT_MAX_WAITS = 12
+
+# Directory (relative to the current directory) of the append-only files with each stage's per-record results
+RESULTS_DIRECTORY = "results"
+# Most records submitted in one bulk job, which bounds how many results are held before being written out
+RESULT_CHUNK_ROWS = 10000
+# Key of the worksheet row number in each record read from a worksheet, removed before the record is sent
+SOURCE_ROW_FIELD = "_sourceRow"
+
+# Workbooks loaded at once in batch mode, and parsed workbooks waiting for a free worker
+BATCH_WORKERS = 4
+BATCH_QUEUE_SIZE = 2
+
+# Records loaded by each calibration trial, and how many worksheet rows are used as the templates for them
+CALIBRATION_ROWS = 2000
+CALIBRATION_TEMPLATE_ROWS = 50
+# Batch sizes and numbers of bulk jobs in flight at once tried by calibration
+CALIBRATION_BATCH_SIZES = (200, 500, 1000)
+CALIBRATION_CONCURRENCY = (1, 2, 4)
+# Highest share of records that may fail with UNABLE_TO_LOCK_ROW for calibration to choose a setting
+CALIBRATION_MAX_LOCK_RATE = 0.01
+
+# Stages of a load with their sObjects, in load order
+LOAD_STAGES = [("Users", "User"), ("ParentAccounts", "Account"), ("ChildAccounts", "Account"),
+               ("PersonAccounts", "Account"), ("Contacts", "Contact"), ("Producers", "Producer"), ("Leads", "Lead"),
+               ("Opportunities", "Opportunity"), ("Tasks", "Task"), ("Cases", "Case"),
+               ("OperatingHours", "OperatingHours"), ("WorkType", "WorkType"), ("ServiceTerritory", "ServiceTerritory"),
+               ("ServiceTerritoryWorkType", "ServiceTerritoryWorkType"), ("WorkTypeGroup", "WorkTypeGroup")]
+# The earlier stages whose records each stage looks up by name, which are queried from the org when they're skipped
+STAGE_LOOKUPS = {"ParentAccounts": ["Users"], "ChildAccounts": ["Users", "ParentAccounts"],
+                 "PersonAccounts": ["Users"], "Contacts": ["Users"],
+                 "Producers": ["Users", "ParentAccounts", "ChildAccounts", "PersonAccounts", "Contacts"],
+                 "Leads": ["Users", "ParentAccounts", "ChildAccounts", "PersonAccounts"],
+                 "Opportunities": ["Users", "ParentAccounts", "ChildAccounts", "PersonAccounts"],
+                 "Tasks": ["Users", "ParentAccounts", "ChildAccounts", "PersonAccounts", "Contacts"],
+                 "Cases": ["ParentAccounts", "ChildAccounts", "PersonAccounts", "Contacts", "Producers"],
+                 "WorkType": ["OperatingHours"], "ServiceTerritory": ["OperatingHours"],
+                 "ServiceTerritoryWorkType": ["ServiceTerritory", "WorkType"]}
+
+# Stages deleted by a teardown with their sObjects, in reverse dependency order. Users are never deleted
+TEARDOWN_STAGES = [("ServiceTerritoryWorkType", "ServiceTerritoryWorkType"), ("WorkTypeGroup", "WorkTypeGroup"),
+                   ("ServiceTerritory", "ServiceTerritory"), ("WorkType", "WorkType"),
+                   ("OperatingHours", "OperatingHours"), ("Cases", "Case"), ("Tasks", "Task"),
+                   ("Opportunities", "Opportunity"), ("Leads", "Lead"), ("Producers", "Producer"),
+                   ("Contacts", "Contact"), ("PersonAccounts", "Account"), ("ChildAccounts", "Account"),
+                   ("ParentAccounts", "Account")]
+# Worksheet columns that make up a record's Name, which is what other sheets and lookups refer to it by
+NAME_COLUMNS = {"Users": (0, 1), "ParentAccounts": (0,), "ChildAccounts": (0,), "PersonAccounts": (27, 28),
+                "Contacts": (0, 1), "Producers": (0,), "Leads": (3, 4), "Opportunities": (3,)}
+# Names of the records created without a worksheet
+TEARDOWN_STATIC_NAMES = {"OperatingHours": "test hours", "WorkType": "test work type",
+                         "ServiceTerritory": "test service territory", "WorkTypeGroup": "test work type group"}
+# Number of records sent in each bulk delete batch
+TEARDOWN_BATCH_SIZE = 1000
+# Number of names or ids in each query's IN list, to stay under the SOQL statement length limit
+QUERY_CHUNK_SIZE = 200
+
+# Connections kept open by the async transport, seconds between bulk batch status checks and request timeout
+ASYNC_MAX_CONNECTIONS = 50
+ASYNC_POLL_SECONDS = 2
+ASYNC_TIMEOUT_SECONDS = 120
+
+# Records written to each compiled payload file, which is also the most records each insert sends when pushing
+COMPILE_SHARD_ROWS = 2000
+# A lookup left in a compiled payload, i.e. {{users:Jane Smith}}, resolved to an id when the payload is pushed
+PLACEHOLDER_PATTERN = re.compile(r'^\{\{([^:{}]+):(.*)\}\}$', re.S)
+
+# The record type column (counting from 1) of each sheet and the object whose record types it names
+RECORD_TYPE_COLUMNS = {"ParentAccounts": ("Account", 3), "ChildAccounts": ("Account", 3),
+                       "PersonAccounts": ("Account", 3), "Contacts": ("Contact", 3), "Leads": ("Lead", 1),
+                       "Opportunities": ("Opportunity", 1)}
+
+# Columns (counting from 0) of each sheet that refer to another sheet's records by name, and the lookup they use
+SAMPLE_REFERENCES = {"Cases": [(2, "producers"), (3, "contacts"), (6, "accounts")],
+                     "Tasks": [(2, "contacts"), (4, "accounts"), (9, "users")],
+                     "Leads": [(1, "users"), (31, "accounts"), (32, "users")],
+                     "Opportunities": [(1, "users"), (2, "accounts")],
+                     "Producers": [(1, "accounts"), (2, "contacts"), (5, "users")],
+                     "Contacts": [(3, "users")],
+                     "PersonAccounts": [(3, "users")],
+                     "ChildAccounts": [(3, "users"), (13, "parentAccounts")],
+                     "ParentAccounts": [(3, "users")]}
+# The sheets whose records each lookup finds by name
+SAMPLE_LOOKUP_SHEETS = {"users": ["Users"], "parentAccounts": ["ParentAccounts", "ChildAccounts"],
+                        "accounts": ["ParentAccounts", "ChildAccounts", "PersonAccounts"], "contacts": ["Contacts"],
+                        "producers": ["Producers"]}
+# Sheets in the order the sampler pulls in referenced rows. Every sheet comes before the sheets it refers to, so the
+# rows pulled into a sheet have their own references followed when that sheet's turn comes
+SAMPLE_ORDER = ["Cases", "Tasks", "Leads", "Opportunities", "Producers", "Contacts", "PersonAccounts",
+                "ChildAccounts", "ParentAccounts", "Users"]
+
+# Describe metadata per org and sObject, loaded from and saved to each org's cache file
+describeCache = dict()
+# Calibrated batch size, job mode and concurrency per org and sObject, loaded from and saved to each org's cache file
+loadProfiles = dict()
+# Tracks the API requests and bulk batches used by this run, set up once logged in
+limitTracker = None
+# Sends queries and bulk jobs over a pooled async HTTP client when --transport async is used
+asyncTransport = None
+# Ids of the users, profiles, roles and record types looked up by name, per org and keyed like the placeholders in
+# compiled payloads. Filled in while the workbook is parsed and shared by batch mode's workers
+lookupCache = dict()
+lookupLock = threading.Lock()
+# Guards the org's cache files, which batch mode's workers read and write at the same time
+cacheLock = threading.Lock()
+# The path, results directory and current stage of the workbook being loaded on each thread
+loadContext = threading.local()
+# When this run started, written with each result so runs can be told apart in the results files
+runStarted = datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def main(argv=None):
+
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
     # registers handler for signal interrupt (i.e. Ctrl+C)
     signal.signal(signal.SIGINT, interruptHandler)
     # Will write logs to a file called result.log in the current directory (overwriting that file if it already exists)
@@ -22,28 +169,399 @@ def main(filePath = sys.argv[1], username = sys.argv[2], password = sys.argv[3],
     # Hides the root component for the GUI so it doesn't appear when no GUI is being used
     root = tkinter.Tk()
     root.withdraw()
-    wb = loadWorkbook(filePath)
-    sf = loginToSalesforce(username, password, token)
-    users = getUsers(sf, wb, createUsers)
-    parentAccounts = createParentAccounts(sf, users, wb)
-    childAccounts = createChildAccounts(sf, users, parentAccounts, wb)
-    personAccounts = createPersonAccounts(sf, users, wb)
+    stages = args.stages or [stage for stage, sobject in LOAD_STAGES]
+    loadContext.workbook = os.path.abspath(args.filePath)
+    if args.batch:
+        sf = loginAndTrackLimits(args.username, args.password, args.token, args.apiShare)
+        if args.transport == "async":
+            startAsyncTransport(sf)
+        runBatch(sf, args, stages)
+        finish(None)
+        return
+    if args.push:
+        sf = loginAndTrackLimits(args.username, args.password, args.token, args.apiShare)
+        if args.transport == "async":
+            startAsyncTransport(sf)
+        pushCompiled(sf, args.filePath, args.createUsers)
+        finish(None)
+        return
+    if args.compile:
+        wb = loadWorkbook(args.filePath, args.parallelParse)
+        if args.sample:
+            sampled = sampleWorkbook(wb, args.sample)
+            wb.close()
+            wb = sampled
+        compileWorkbook(wb, args.compile)
+        wb.close()
+        logInfo('Finished')
+        return
+    wb, sf = startLoad(args)
+    if args.transport == "async":
+        startAsyncTransport(sf)
+    if args.calibrate:
+        calibrate(sf, wb, stages)
+        finish(wb)
+        return
+    if args.teardown or args.reset:
+        teardown(sf, wb, args.hardDelete, stages)
+        if args.teardown:
+            finish(wb)
+            return
+    if args.sample:
+        sampled = sampleWorkbook(wb, args.sample)
+        wb.close()
+        wb = sampled
+    runLoad(sf, wb, args, stages)
+    finish(wb)
+
+
+def runLoad(sf, wb, args, stages):
+    """Runs the selected stages of a load, each with the records of the stages before it
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        args (argparse.Namespace) -- the parsed command line arguments
+        stages (list of string) -- the stages selected to run
+
+    Returns:
+        void
+    """
+    limitTracker.planLoad(dict((ws.title, max(ws.max_row - 1, 0)) for ws in wb.worksheets if ws.title in stages))
+    users = runStage(sf, wb, stages, "Users", lambda: getUsers(sf, wb, args.createUsers))
+    parentAccounts = runStage(sf, wb, stages, "ParentAccounts", lambda: createParentAccounts(sf, users, wb))
+    childAccounts = runStage(sf, wb, stages, "ChildAccounts",
+                             lambda: createChildAccounts(sf, users, parentAccounts, wb))
+    personAccounts = runStage(sf, wb, stages, "PersonAccounts", lambda: createPersonAccounts(sf, users, wb))
     accounts = {**parentAccounts, **childAccounts, **personAccounts}
-    contacts = createContacts(sf, users, wb)
-    producers = createProducers(sf, users, wb, accounts, contacts)
-    createLeads(sf, users, wb, accounts)
-    createOpportunities(sf, users, wb, accounts)
-    createTasks(sf, users, wb, accounts, contacts)
-    createCases(sf, producers, wb, accounts, contacts)
-    operatingHours = createOperatingHours(sf)
-    workType = createWorkType(sf, operatingHours)
-    serviceTerritory = createServiceTerritory(sf, operatingHours)
-    createServiceTerritoryWorkType(sf, serviceTerritory, workType)
-    createWorkTypeGroup(sf)
-    wb.close()
+    contacts = runStage(sf, wb, stages, "Contacts", lambda: createContacts(sf, users, wb))
+    producers = runStage(sf, wb, stages, "Producers", lambda: createProducers(sf, users, wb, accounts, contacts))
+    runStage(sf, wb, stages, "Leads", lambda: createLeads(sf, users, wb, accounts))
+    runStage(sf, wb, stages, "Opportunities", lambda: createOpportunities(sf, users, wb, accounts))
+    runStage(sf, wb, stages, "Tasks", lambda: createTasks(sf, users, wb, accounts, contacts))
+    runStage(sf, wb, stages, "Cases", lambda: createCases(sf, producers, wb, accounts, contacts))
+    operatingHours = runStage(sf, wb, stages, "OperatingHours", lambda: createOperatingHours(sf))
+    workType = runStage(sf, wb, stages, "WorkType", lambda: createWorkType(sf, operatingHours))
+    serviceTerritory = runStage(sf, wb, stages, "ServiceTerritory",
+                                lambda: createServiceTerritory(sf, operatingHours))
+    runStage(sf, wb, stages, "ServiceTerritoryWorkType",
+             lambda: createServiceTerritoryWorkType(sf, serviceTerritory, workType))
+    runStage(sf, wb, stages, "WorkTypeGroup", lambda: createWorkTypeGroup(sf))
+
+
+def runStage(sf, wb, stages, stage, create):
+    """Runs a load stage if it was selected, otherwise gets its records from the org if a selected stage needs them
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        stages (list of string) -- the stages selected to run
+        stage (string) -- the stage to run
+        create (function) -- runs the stage, returning the created records' ids by name
+
+    Returns:
+        (dict of string : string) -- the stage's records' ids by name, or an empty dictionary when nothing needs them
+    """
+    loadContext.stage = stage
+    if stage in stages:
+        return create()
+    if any(stage in STAGE_LOOKUPS.get(selected, []) for selected in stages):
+        return hydrateStage(sf, wb, stage, dict(LOAD_STAGES).get(stage))
+    return dict()
+
+
+def hydrateStage(sf, wb, stage, sobject):
+    """Gets the ids by name of a skipped stage's records that are already in the org, without creating any records
+
+    The ids recorded when this workbook was loaded before are used when the stage has them, since other workbooks'
+    records may share its names. Otherwise the records are found by the names in the workbook. Users are queried by
+    name the same as when they aren't being created.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data that was loaded
+        stage (string) -- the skipped stage
+        sobject (string) -- the object the stage's records are of
+
+    Returns:
+        (dict of string : string) -- the ids of the stage's records with the name as the key
+    """
+    if stage == "Users":
+        return queryUsers(sf, wb)
+    workbookIds = loadLoadedIds(sf).get(stage, {}).get('workbooks', {})
+    recordIds = workbookIds.get(getattr(loadContext, "workbook", None))
+    if recordIds:
+        logInfo("Querying " + str(len(recordIds)) + " previously loaded " + stage)
+        return queryRecordMap(sf, sobject, "Id", recordIds)
+    logInfo("Querying " + stage + " by name")
+    return queryRecordMap(sf, sobject, "Name", getWorkbookNames(wb, stage))
+
+
+def queryRecordMap(sf, sobject, field, values):
+    """Queries records' ids by name, matching a field against the values a chunk at a time
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        sobject (string) -- the object to query
+        field (string) -- the field to match (i.e. Id or Name)
+        values (list of string) -- the values to match
+
+    Returns:
+        recordMap (dict of string : string) -- the ids of the matching records with the name as the key
+    """
+    return createRecordMap({'records': queryRecords(sf, sobject, field, values)}, sobject)
+
+
+def queryRecords(sf, sobject, field, values):
+    """Queries the Id and Name of records, matching a field against the values a chunk at a time
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        sobject (string) -- the object to query
+        field (string) -- the field to match (i.e. Id or Name)
+        values (list of string) -- the values to match
+
+    Returns:
+        records (list of dict of string : string) -- the matching records, including any that share a name
+    """
+    records = []
+    try:
+        # Queries the values in chunks to stay under the SOQL statement length limit
+        for i in range(0, len(values), QUERY_CHUNK_SIZE):
+            q = format_soql("SELECT Id, Name FROM " + sobject + " WHERE " + field + " IN {values}",
+                            values=values[i:i + QUERY_CHUNK_SIZE])
+            records.extend(querySalesforce(sf, q).get('records'))
+    except Exception as ex:
+        logError("Could not query " + sobject + " records", ex)
+    return records
+
+
+def finish(wb):
+    """Closes the workbook and any async transport, then reports the API usage of the run
+
+    Parameters:
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data, or None when pushing compiled payloads
+
+    Returns:
+        void
+    """
+    if wb is not None:
+        wb.close()
+    if asyncTransport is not None:
+        asyncTransport.close()
+    limitTracker.logUsage()
     logInfo('Finished')
 
 
+def startLoad(args):
+    """Logs in and prefetches the lookups from the org while the workbook is being parsed
+
+    Parameters:
+        args (argparse.Namespace) -- the parsed command line arguments
+
+    Returns:
+        (tuple of openpyxl.workbook.Workbook, Salesforce) -- the workbook and the active Salesforce connection
+    """
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        login = pool.submit(loginAndTrackLimits, args.username, args.password, args.token, args.apiShare)
+        # Teardown and calibration don't look anything up by name
+        prefetch = None
+        if not (args.teardown or args.calibrate):
+            prefetch = pool.submit(prefetchLookups, login, args.filePath, args.createUsers)
+        wb = loadWorkbook(args.filePath, args.parallelParse)
+        sf = login.result()
+        if prefetch is not None:
+            prefetch.result()
+    return wb, sf
+
+
+def loginAndTrackLimits(uname, pas, token, share):
+    """Logs into Salesforce and starts tracking the API limits used by the run
+
+    Parameters:
+        uname (string) -- the Salesforce username
+        pas (string) -- the Salesforce password
+        token (string) -- the Salesforce security token
+        share (float) -- the share (0 to 1) of the org's remaining requests and batches this run may use
+
+    Returns:
+        sf (Salesforce) -- The Salesforce session object
+    """
+    sf = loginToSalesforce(uname, pas, token)
+    startLimitTracking(sf, share)
+    return sf
+
+
+def prefetchLookups(login, filePath, createOrQuery):
+    """Queries the names looked up in the org as soon as they have been read out of the workbook
+
+    Each sheet is scanned in a process of its own, so the scans don't compete with the main parse for the interpreter,
+    and a sheet's queries are submitted as soon as its scan finishes. The queries wait for the login to finish and run
+    at the same time as each other.
+
+    Parameters:
+        login (concurrent.futures.Future) -- the login, which gives the active Salesforce connection
+        filePath (string) -- the path to the Excel workbook
+        createOrQuery (string) -- True if the users will be created, False if they will be queried
+
+    Returns:
+        void
+    """
+    sheets = ["Users"] + list(RECORD_TYPE_COLUMNS)
+    # Leaves a core for the main parse
+    workers = max(1, min(len(sheets), (os.cpu_count() or 2) - 1))
+    submitted = dict()
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor() as queries:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as scan:
+                scans = [scan.submit(readLookupNames, filePath, sheet, createOrQuery) for sheet in sheets]
+                for done in concurrent.futures.as_completed(scans):
+                    for kind, names in done.result().items():
+                        # Sheets of the same object share a lookup, so only the names not already submitted are queried
+                        names = names.difference(submitted.setdefault(kind, set()))
+                        submitted[kind].update(names)
+                        if names:
+                            futures.append(queries.submit(prefetchLookup, login, kind, names))
+        except Exception as ex:
+            logError("Could not read lookup names from Excel workbook", ex)
+        for future in futures:
+            future.result()
+
+
+def readLookupNames(filePath, sheet, createOrQuery):
+    """Streams the names looked up in the org out of one sheet. Runs in its own process while the workbook is parsed
+
+    Parameters:
+        filePath (string) -- the path to the Excel workbook
+        sheet (string) -- the Users sheet or a sheet with a record type column
+        createOrQuery (string) -- True if the users will be created, False if they will be queried
+
+    Returns:
+        lookupNames (dict of string : set of string) -- the names for each lookup, keyed like the lookup cache
+    """
+    lookupNames = dict()
+    wb = load_workbook(filePath, read_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            return lookupNames
+        if sheet == "Users":
+            userNames, profileNames, roleNames = set(), set(), set()
+            for row in wb["Users"].iter_rows(min_row=2, max_col=7, values_only=True):
+                row = row + (None,) * (7 - len(row))
+                if (row[0] != None and row[1] != None):
+                    userNames.add(row[0] + " " + row[1])
+                profileNames.add(row[5])
+                roleNames.add(row[6])
+            if createOrQuery.lower() == "true":
+                lookupNames["Profile"] = profileNames
+                lookupNames["UserRole"] = roleNames
+            else:
+                lookupNames["users"] = userNames
+        else:
+            sobject, col = RECORD_TYPE_COLUMNS.get(sheet)
+            recordTypeNames = lookupNames["RecordType." + sobject] = set()
+            for recordType in wb[sheet].iter_rows(min_row=2, min_col=col, max_col=col, values_only=True):
+                recordTypeNames.add(recordType[0])
+    finally:
+        wb.close()
+    return lookupNames
+
+
+def prefetchLookup(login, kind, names):
+    """Queries one lookup once logged in, adding it to the org's lookup cache
+
+    Parameters:
+        login (concurrent.futures.Future) -- the login, which gives the active Salesforce connection
+        kind (string) -- users, Profile, UserRole or RecordType. followed by the object
+        names (set of string) -- the names to look up
+
+    Returns:
+        void
+    """
+    getLookupIds(login.result(), kind, names)
+
+
+def getLookupIds(sf, kind, names):
+    """Gets the ids of org records looked up by name, only querying the names that aren't in the org's lookup cache
+
+    Names that weren't found aren't cached, since users may be created by a later workbook.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        kind (string) -- users, Profile, UserRole or RecordType. followed by the object
+        names (iterable of string) -- the names to look up
+
+    Returns:
+        (dict of string : string) -- the ids of the names that were found
+    """
+    names = set(name for name in names if name is not None)
+    with lookupLock:
+        cached = lookupCache.setdefault(getOrgName(sf), dict()).setdefault(kind, dict())
+        missing = sorted(names.difference(cached))
+    if missing:
+        found = queryUsersByName(sf, missing) if kind == "users" else queryLookupNames(sf, kind, missing)
+        with lookupLock:
+            cached.update(found)
+    with lookupLock:
+        return dict((name, cached.get(name)) for name in names if name in cached)
+
+
+def parseArguments(argv):
+    """Reads the command line arguments passed in by runUpload.bat
+
+    Parameters:
+        argv (list of string) -- the command line arguments, not including the script name
+
+    Returns:
+        (argparse.Namespace) -- the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Loads test data from an Excel workbook into a Salesforce sandbox")
+    parser.add_argument("filePath", help="the Excel workbook containing the test data, the compiled payloads with "
+                                         "--push, or a directory or list of workbooks with --batch")
+    parser.add_argument("username", nargs="?", help="the Salesforce username to log in with")
+    parser.add_argument("password", nargs="?", help="the Salesforce password")
+    parser.add_argument("token", nargs="?", help="the Salesforce security token")
+    parser.add_argument("createUsers", nargs="?", help="True to create the users in the Users sheet, False to query them")
+    parser.add_argument("--api-share", dest="apiShare", type=apiShare, default=DEFAULT_API_SHARE,
+                        help="the share (0 to 1) of the org's remaining daily API requests and bulk batches this run may use")
+    parser.add_argument("--teardown", action="store_true",
+                        help="delete the test data loaded by previous runs (or named in the workbook) instead of loading")
+    parser.add_argument("--reset", action="store_true",
+                        help="delete the test data loaded by previous runs, then load the workbook")
+    parser.add_argument("--hard-delete", dest="hardDelete", action="store_true",
+                        help="hard delete instead of moving deleted records to the recycle bin")
+    parser.add_argument("--transport", choices=["sync", "async"], default="sync",
+                        help="send queries and bulk jobs with simple_salesforce (sync) or over a pooled async HTTP client")
+    parser.add_argument("--parallel-parse", dest="parallelParse", action="store_true",
+                        help="parse the workbook's worksheets in a pool of processes, one per core")
+    parser.add_argument("--compile", metavar="DIRECTORY",
+                        help="compile the workbook into payload files in DIRECTORY instead of loading it")
+    parser.add_argument("--push", action="store_true",
+                        help="load the payload files compiled into the directory given instead of a workbook")
+    parser.add_argument("--sample", type=sampleSize,
+                        help="load only a fraction (i.e. 0.05) or number (i.e. 50) of the rows of each sheet, along "
+                             "with every row they refer to")
+    parser.add_argument("--stages", type=stageList,
+                        help="run only these comma separated stages (i.e. Cases,Tasks), looking up the records they "
+                             "refer to in the org instead of creating them again")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="time loading the workbook's sObjects with a range of batch sizes and job concurrency, "
+                             "then save the fastest settings for the org instead of loading")
+    parser.add_argument("--batch", action="store_true",
+                        help="load every workbook in the directory given, or listed one per line in the file given, "
+                             "sharing one login and loading several at once")
+    args = parser.parse_args(argv)
+    if (args.stages or args.calibrate) and (args.compile or args.push):
+        parser.error("--stages and --calibrate can't be used with --compile or --push")
+    if args.batch and (args.compile or args.push or args.calibrate or args.teardown or args.reset):
+        parser.error("--batch can't be used with --compile, --push, --calibrate, --teardown or --reset")
+    # Only compiling can be done without logging in
+    if not args.compile and None in (args.username, args.password, args.token, args.createUsers):
+        parser.error("username, password, token and createUsers are required unless compiling")
+    return args
+
+
 def interruptHandler(sig, frame):
     print("\nExiting program")
     sys.exit(0)
@@ -78,23 +596,128 @@ def logError(errorMessage, error):
     sys.exit(0)
 
 
-def loadWorkbook(filePath):
+def loadWorkbook(filePath, parallel=False):
     """Loads the test data workbook
 
+    Parameters:
+        filePath (string) -- the path to the Excel workbook
+        parallel (boolean) -- whether to parse the worksheets in a pool of processes instead of one at a time
+
     Returns:
-        wb (openpyxl.workbook.Workbook) -- The workbook containing the test data to create
+        wb (openpyxl.workbook.Workbook or ParsedWorkbook) -- The workbook containing the test data to create
     """
     fileTypes = (("Excel files", "*.xlsx"), ("All Files", "*.*"))
     try:
         logInfo("Prompting for Excel workbook")
         # Opens a file dialog box and then opens the Excel workbook selected
-        wb = load_workbook(filePath)
+        wb = parseWorkbook(filePath) if parallel else load_workbook(filePath)
         logInfo("Loading Excel workbook")
         return wb
     except Exception as ex:
         logError("Could not load Excel workbook", ex)
 
 
+def readSheetRows(filePath, sheetName):
+    """Reads the values of every row of one worksheet. Runs in a worker process when parsing in parallel
+
+    Parameters:
+        filePath (string) -- the path to the Excel workbook
+        sheetName (string) -- the worksheet to read
+
+    Returns:
+        (list of tuple) -- the values of each row
+    """
+    wb = load_workbook(filePath, read_only=True)
+    try:
+        ws = wb[sheetName]
+        # Reads to the last row in the file instead of stopping at the worksheet's recorded dimension, which some
+        # writers leave too small
+        ws.reset_dimensions()
+        return list(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def parseWorkbook(filePath):
+    """Parses every worksheet of the workbook at the same time in a pool of processes
+
+    Each worksheet is an XML part of its own in the .xlsx file, so each one is read by a separate process and its rows
+    are sent back pickled. A worksheet is read by a single process since openpyxl parses from the first row whichever
+    rows are asked for.
+
+    Parameters:
+        filePath (string) -- the path to the Excel workbook
+
+    Returns:
+        (ParsedWorkbook) -- the values of every worksheet
+    """
+    wb = load_workbook(filePath, read_only=True)
+    sheetNames = wb.sheetnames
+    wb.close()
+
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        futures = [pool.submit(readSheetRows, filePath, sheetName) for sheetName in sheetNames]
+        return ParsedWorkbook([ParsedSheet(sheetName, future.result())
+                               for sheetName, future in zip(sheetNames, futures)])
+
+
+class ParsedSheet:
+    """The values of a worksheet that has already been parsed, read the same way as an openpyxl worksheet"""
+
+    def __init__(self, title, rows, rowNumbers=None):
+        """
+        Parameters:
+            title (string) -- the worksheet name
+            rows (list of tuple) -- the values of each row, starting with the header row
+            rowNumbers (list of integer) -- the row number of each row in the workbook, when they aren't consecutive
+        """
+        self.title = title
+        self.rowNumbers = rowNumbers
+        width = max((len(row) for row in rows), default=0)
+        # Pads rows with trailing empty cells so every row can be indexed up to the last column
+        self.rows = [row + (None,) * (width - len(row)) for row in rows]
+        self.max_row = len(self.rows)
+        self.max_column = width
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None, values_only=True):
+        """Yields the values of a range of rows like openpyxl's Worksheet.iter_rows with values_only=True"""
+        for row in self.rows[min_row - 1:max_row]:
+            yield row[min_col - 1:max_col]
+
+
+def iterSourceRows(ws):
+    """Yields the values of each row after the header with the row's number in the workbook
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet, or a ParsedSheet of rows picked from one
+
+    Returns:
+        (iterator of tuple of integer, tuple) -- the row number and values of each row
+    """
+    rows = ws.iter_rows(min_row=2, values_only=True)
+    rowNumbers = getattr(ws, "rowNumbers", None)
+    return zip(rowNumbers[1:], rows) if rowNumbers else enumerate(rows, 2)
+
+
+class ParsedWorkbook:
+    """The values of every worksheet of a workbook that has already been parsed"""
+
+    def __init__(self, worksheets):
+        """
+        Parameters:
+            worksheets (list of ParsedSheet) -- the worksheets, in workbook order
+        """
+        self.worksheets = worksheets
+        self.sheetnames = [ws.title for ws in worksheets]
+        self.sheets = dict((ws.title, ws) for ws in worksheets)
+
+    def __getitem__(self, sheetName):
+        return self.sheets[sheetName]
+
+    def close(self):
+        """Does nothing since the workbook file was already closed when it was parsed"""
+
+
 def loginToSalesforce(uname, pas, token):
     """Gets user credentials and logs into Salesforce
 
@@ -129,30 +752,37 @@ def createRecordMap(records, sobject):
     return recordMap
 
 
-def queryCreatedRecords(sf, records, sobject):
-    """Queries for the name and id of the records that are passed in
+def flattenResults(results):
+    """Gets the results of a bulk operation as one list with a result for each record, in the order they were sent
+
+    Parameters:
+        results (list) -- the results of the bulk operation
+
+    Returns:
+        flattened (list of dict of string : string) -- the result of each record
+    """
+    flattened = []
+    for result in results:
+        # Older versions of simple_salesforce return a list of results per batch rather than one flat list
+        flattened.extend(result if isinstance(result, list) else [result])
+    return flattened
+
+
+def queryCreatedRecords(sf, recordIds, sobject):
+    """Queries for the name and id of the records that were created
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
-        records (list of dict of string : string) -- a list containing one item which is a dictionary of information regarding the created records
+        recordIds (list of string) -- the ids of the created records
         sobject (string) -- the Salesforce object these are records of
 
     Returns:
-        createRecordMap (queriedRecords, sobject) (dict of string : string) -- A dictionary of the queried records with the name as the key and the id as the value
+        (dict of string : string) -- A dictionary of the queried records with the name as the key and the id as the value
     """
-    try:
-        recordIds = []
-        for r in records[0]:
-            recordIds.append(r.get('id'))
-        logInfo("Querying created " + sobject + "s")
-        q = "SELECT Id, Name FROM " + sobject + " WHERE Id IN {ids}"
-        q = format_soql(q, ids=recordIds)
-        logInfo("Query: " + q)
-        queriedRecords = sf.query(q)
-        logInfo("Got created " + sobject + " records")
-        return createRecordMap(queriedRecords, sobject)
-    except Exception as ex:
-        logError("Could not query " + sobject + "s", ex)
+    logInfo("Querying created " + sobject + "s")
+    createdRecords = queryRecordMap(sf, sobject, "Id", recordIds)
+    logInfo("Got created " + sobject + " records")
+    return createdRecords
 
 
 def getRecordTypes(sf, ws, col, sobject):
@@ -175,279 +805,1242 @@ def getRecordTypes(sf, ws, col, sobject):
     except Exception as ex:
         logError("Could not read " + sobject.lower() + " record type names from worksheet", ex)
 
-    try:
-        logInfo("Querying " + sobject.lower() + " record types")
-        recordTypes = sf.query(
-            format_soql(
-                "SELECT Id, Name FROM RecordType WHERE SobjectType = {obj} AND IsActive = TRUE AND Name in {names}",
-                obj=sobject, names=list(recordTypeNames)))
-        logInfo("Got " + sobject.lower() + " record types")
-        return createRecordMap(recordTypes, sobject)
-    except Exception as ex:
-        logError("Could not query " + sobject.lower() + " record types", ex)
+    # Only queries the record types that weren't prefetched or looked up for an earlier workbook
+    return getLookupIds(sf, "RecordType." + sobject, recordTypeNames)
 
 
-def getUsers(sf, wb, createUsers):
-    """Checks if the user wants to create users or not. If not, queries existing users instead
+def getOrgName(sf):
+    """Gets a name for the connected org that is safe to use in file names
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
-        wb (openpyxl.workbook.Workbook) -- The workbook containing the test data to create
 
     Returns:
-        (dict of string : string) -- A dictionary of users where the name is the key and the Id is the value
+        (string) -- the org's instance host name with any characters that can't be in a file name replaced
     """
-    createOrQuery = None
-    if (createUsers.lower() == "true"):
-        return createUsers(sf, wb)
-    else:
-        return queryUsers(sf, wb)
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in sf.sf_instance)
 
 
-def queryUsers(sf, wb):
-    ws = wb["Users"]
-    userNames = []
-    try:
-        logInfo("Reading users from Excel")
-        for name in ws.iter_rows(min_row=2, max_col=2, values_only=True):
-            if (name[0] != None and name[1] != None):
-                userNames.append(name[0] + " " + name[1])
-    except Exception as ex:
-        logError("Could not read users", ex)
+def getCachePath(sf, kind):
+    """Gets the path of one of the org's cache files, creating the cache directory if needed
 
-    try:
-        logInfo("Querying users")
-        users = sf.query(format_soql("SELECT Id, Name FROM User WHERE Name IN {names}", names=userNames))
-        return createRecordMap(users, "User")
-    except Exception as ex:
-        logError("Could not query users", ex)
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        kind (string) -- what is cached in the file (i.e. describe)
+
+    Returns:
+        (string) -- the path to the cache file
+    """
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    return os.path.join(CACHE_DIRECTORY, kind + "_" + getOrgName(sf) + ".json")
 
 
-def createUsers(sf, wb):
-    """Creates users in the target org
+def loadLoadedIds(sf):
+    """Loads the ids of the records created in the org by previous runs
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
-        wb (openpyxl.workbook.Workbook) -- The workbook containing the test data to create
 
     Returns:
-        user (dict of string : string) -- a dictionary of the created users with Name as the key and Id as the value
+        (dict of string : dict of string : any) -- the sObject, created ids and created ids by workbook for each stage
     """
+    cachePath = getCachePath(sf, "loaded")
+    if not os.path.exists(cachePath):
+        return dict()
     try:
-        logInfo("Getting user to set username")
-        instance = sf.sf_instance
-        orgName = '.' + instance.replace('.my.salesforce.com', '').replace('westernsouthernfinancialgroup--', '')
+        with open(cachePath) as cacheFile:
+            return json.load(cacheFile)
     except Exception as ex:
-        logError("Could not get user", ex)
+        logError("Could not read the ids of previously loaded records from " + cachePath, ex)
 
-    ws = wb["Users"]
-    try:
-        logInfo("Querying profiles")
-        profileNames = set()
-        for profile in ws.iter_rows(min_row=2, min_col=6, max_col=6, values_only=True):
-            profileNames.add(profile[0])
-        profiles = sf.query(format_soql(
-            "SELECT Id, Name FROM Profile WHERE Name IN {pro}", pro=list(profileNames)))
-        profileMap = createRecordMap(profiles, "Profile")
-    except Exception as ex:
-        logError("Could not query profiles", ex)
 
-    try:
-        logInfo("Querying roles")
-        roleNames = set()
-        for role in ws.iter_rows(min_row=2, min_col=7, max_col=7, values_only=True):
-            roleNames.add(role[0])
-        roles = sf.query(format_soql("SELECT Id, Name FROM UserRole WHERE Name IN {rol}", rol=list(roleNames)))
-        roleMap = createRecordMap(roles, "Role")
-    except Exception as ex:
-        logError("Could not query roles", ex)
+def saveLoadedIds(sf, loaded):
+    """Saves the ids of the records created in the org so a later teardown can delete them
 
-    try:
-        logInfo("Reading users from Excel")
-        insertUsers = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if (row[0] == None):
-                continue
-            insertUsers.append(
-                {'FirstName': row[0],
-                 'LastName': row[1],
-                 'Username': str(row[2]) + orgName, 'Email': row[3],
-                 'Title': row[4],
-                 'ProfileId': profileMap.get(row[5]),
-                 'UserRoleId': roleMap.get(row[6]),
-                 # creates alias from first character of first name and the first seven characters of the last name. Slicing a string shorter than seven characters doesn't cause an out of bounds exception
-                 'Alias': str(row[0][0]) + str(row[1][0:7]),
-                 'IsActive': True, 'TimeZoneSidKey': 'America/New_York', 'LocaleSidKey': 'en_US',
-                 'EmailEncodingKey': 'UTF-8', 'LanguageLocaleKey': 'en_US'})
-        logInfo("Creating users")
-        users = sf.bulk.User.insert(insertUsers, batch_size=100)
-        logInfo("Created users")
-        logging.info(users)
-        return queryCreatedRecords(sf, users, "User")
-    except Exception as ex:
-        logError("Could not create users", ex)
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        loaded (dict of string : dict of string : any) -- the sObject, created ids and created ids by workbook for each
+            stage
+
+    Returns:
+        void
+    """
+    with open(getCachePath(sf, "loaded"), "w") as cacheFile:
+        json.dump(loaded, cacheFile)
 
 
-def createParentAccounts(sf, users, wb):
-    """Creates parent accounts in the target org
+def recordLoadedIds(sf, stage, sobject, recordIds):
+    """Adds the ids of records created by a stage to the org's loaded ids, and to those of the workbook being loaded
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the users to assign ownership of the parent accounts to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        stage (string) -- the load stage the records were created in
+        sobject (string) -- the object the records are of
+        recordIds (list of string) -- the ids of the created records
 
     Returns:
-        parentAccounts (dict of string : string) -- a dictionary of the created parent accounts with Name as the key and Id as the value
+        void
     """
-    ws = wb["ParentAccounts"]  # Gets the ParentAccounts sheet
-    recordTypeMap = getRecordTypes(sf, ws, 3, "Account")
-    insertParentAccounts = []
-    try:
-        logInfo("Reading Parent Accounts from Excel")
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if (row[0] == None):
-                continue
-            insertParentAccounts.append(
-                {'Name': row[0],
-                 'EEP_Legal_Name_Of_Business__c': u"" if row[1] is None else row[1], 'RecordTypeId': recordTypeMap.get(
-                     row[2]),
-                 'OwnerId': users.get(row[3]),
-                 'BillingStreet': u"" if row[4] is None else row[4], 'BillingCity': u"" if row[5] is None else row
-                 [5], 'BillingState': u"" if row[6] is None else row[6], 'BillingPostalCode': u""
-                 if row[7] is None else row[7], 'BillingCountry': u"" if row[8] is None else row[8], 'Phone': u""
-                 if row[9] is None else row[9], 'EEP_Other_Phone__c': u"" if row[10] is None else row[10], 'Fax': u""
-                 if row[11] is None else row[11], 'EEP_Restricted_Access__c': u"" if row[12] is None else row[12],
-                 'EEP_Producer_Account_Tax_Id__c': u"" if row[14] is None else row[14], 'Website': u""
-                 if row[15] is None else row[15], 'NumberOfEmployees': u"" if row[16] is None else row[16],
-                 'FinServ__ClientCategory__c': u"" if row[17] is None else row[17], 'FinServ__Status__c': u""
-                 if row[18] is None else row[18], 'FinServ__PersonalInterests__c': u"" if row[19] is None else row
-                 [19], 'FinServ__MarketingSegment__c': u"" if row[20] is None else row[20],
-                 'FinServ__FinancialInterests__c': u"" if row[21] is None else row[21], 'FinServ__ServiceModel__c': u""
-                 if row[22] is None else row[22], 'FinServ__ReviewFrequency__c': u"" if row[23] is None else row[23],
-                 'FinServ__InvestmentExperience__c': u"" if row[24] is None else row[24],
-                 'FinServ__InvestmentObjectives__c': u"" if row[25] is None else row[25]})
-        logging.info(insertParentAccounts)
-    except Exception as ex:
-        logError("Could not read Parent Accounts", ex)
-    try:
-        logInfo("Creating Parent Accounts")
-        parentAccounts = sf.bulk.Account.insert(insertParentAccounts, batch_size=100)
-        logInfo("Created Parent Accounts")
-        logging.info(parentAccounts)
-        return queryCreatedRecords(sf, parentAccounts, "Account")
-    except Exception as ex:
-        logError("Could not create Parent Accounts", ex)
+    with cacheLock:
+        loaded = loadLoadedIds(sf)
+        loadedStage = loaded.setdefault(stage, {'sobject': sobject, 'ids': [], 'workbooks': {}})
+        loadedStage['ids'].extend(recordIds)
+        workbook = getattr(loadContext, "workbook", None)
+        if workbook is not None:
+            loadedStage.setdefault('workbooks', {}).setdefault(workbook, []).extend(recordIds)
+        saveLoadedIds(sf, loaded)
 
 
-def createChildAccounts(sf, users, parentAccounts, wb):
-    """Creates child accounts in the target org
+def forgetLoadedIds(sf, stage, recordIds):
+    """Removes the ids of deleted records from the ids loaded into the org
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the users to assign ownership of the accounts to
-        parentAccounts (dict of string: string) -- the accounts that will have child accounts in test data
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        stage (string) -- the load stage the records were created in
+        recordIds (list of string) -- the ids of the deleted records
 
     Returns:
-        childAccounts (dict of string : string) -- a dictionary of the created accounts with Name as the key and Id as the value
+        void
     """
-    ws = wb["ChildAccounts"]  # Gets the ChildAccounts sheet
-    recordTypeMap = getRecordTypes(sf, ws, 3, "Account")
-    insertChildAccounts = []
-    try:
-        logInfo("Reading Child Accounts from Excel")
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if (row[0] == None):
-                continue
-            insertChildAccounts.append(
-                {'Name': row[0],
-                 'EEP_Legal_Name_Of_Business__c': u"" if row[1] is None else row[1], 'RecordTypeId': recordTypeMap.get(
-                     row[2]),
-                 'OwnerId': users.get(row[3]),
-                 'BillingStreet': u"" if row[4] is None else row[4], 'BillingCity': u"" if row[5] is None else row
-                 [5], 'BillingState': u"" if row[6] is None else row[6], 'BillingPostalCode': u""
-                 if row[7] is None else row[7], 'BillingCountry': u"" if row[8] is None else row[8], 'Phone': u""
-                 if row[9] is None else row[9], 'EEP_Other_Phone__c': u"" if row[10] is None else row[10], 'Fax': u""
-                 if row[11] is None else row[11], 'EEP_Restricted_Access__c': u"" if row[12] is None else row[12],
-                 'ParentId': parentAccounts.get(row[13]),
-                 'EEP_Producer_Account_Tax_Id__c': u"" if row[14] is None else row[14], 'Website': u""
-                 if row[15] is None else row[15], 'NumberOfEmployees': u"" if row[16] is None else row[16],
-                 'FinServ__ClientCategory__c': u"" if row[17] is None else row[17], 'FinServ__Status__c': u""
-                 if row[18] is None else row[18], 'FinServ__PersonalInterests__c': u"" if row[19] is None else row
-                 [19], 'FinServ__MarketingSegment__c': u"" if row[20] is None else row[20],
-                 'FinServ__FinancialInterests__c': u"" if row[21] is None else row[21], 'FinServ__ServiceModel__c': u""
-                 if row[22] is None else row[22], 'FinServ__ReviewFrequency__c': u"" if row[23] is None else row[23],
-                 'FinServ__InvestmentExperience__c': u"" if row[24] is None else row[24],
-                 'FinServ__InvestmentObjectives__c': u"" if row[25] is None else row[25]})
-        logging.info(insertChildAccounts)
-    except Exception as ex:
+    deleted = set(recordIds)
+    with cacheLock:
+        loaded = loadLoadedIds(sf)
+        if stage not in loaded:
+            return
+        loaded[stage]['ids'] = [i for i in loaded[stage].get('ids') if i not in deleted]
+        workbookIds = loaded[stage].get('workbooks', {})
+        for workbook in list(workbookIds):
+            workbookIds[workbook] = [i for i in workbookIds[workbook] if i not in deleted]
+            if not workbookIds[workbook]:
+                workbookIds.pop(workbook)
+        if not loaded[stage]['ids']:
+            loaded.pop(stage)
+        saveLoadedIds(sf, loaded)
+
+
+def loadLoadProfile(sf):
+    """Loads the org's calibrated load settings for each sObject
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+
+    Returns:
+        (dict of string : dict of string : any) -- the batch size, job mode and concurrency for each calibrated sObject
+    """
+    orgName = getOrgName(sf)
+    if orgName not in loadProfiles:
+        loadProfiles[orgName] = dict()
+        cachePath = getCachePath(sf, "profile")
+        if os.path.exists(cachePath):
+            try:
+                with open(cachePath) as cacheFile:
+                    loadProfiles[orgName].update(json.load(cacheFile))
+            except Exception as ex:
+                logging.warning("Ignoring unreadable load profile " + cachePath + ": " + str(ex))
+    return loadProfiles[orgName]
+
+
+def saveLoadProfile(sf, profile):
+    """Saves the org's calibrated load settings so later runs use them
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        profile (dict of string : dict of string : any) -- the load settings for each calibrated sObject
+
+    Returns:
+        void
+    """
+    loadProfiles[getOrgName(sf)] = profile
+    with open(getCachePath(sf, "profile"), "w") as cacheFile:
+        json.dump(profile, cacheFile, indent=2)
+
+
+def getLoadSettings(sf, sobject):
+    """Gets the batch size, job mode and concurrency to load an sObject with, calibrated for the org if it has been
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        sobject (string) -- the object to load
+
+    Returns:
+        (dict of string : any) -- the batchSize, serial and concurrency settings
+    """
+    settings = {'batchSize': BATCH_SIZE, 'serial': False, 'concurrency': 1}
+    calibrated = loadLoadProfile(sf).get(sobject)
+    if calibrated:
+        settings.update((key, calibrated.get(key)) for key in settings if key in calibrated)
+        logging.info("Loading " + sobject + " with calibrated settings " + str(settings))
+    return settings
+
+
+def getDescribe(sf, sobject):
+    """Gets the fields of an sObject, using the org's describe cache when it is recent enough
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        sobject (string) -- the object to describe
+
+    Returns:
+        (dict of string : dict of string : string/boolean) -- the object's fields keyed by lower case field name,
+            each with the field's name, type and whether it is createable
+    """
+    cachePath = getCachePath(sf, "describe")
+    # Batch mode's workers describe at the same time, so only one of them reads the cache file
+    with cacheLock:
+        orgDescribes = describeCache.get(getOrgName(sf))
+        if orgDescribes is None:
+            orgDescribes = describeCache[getOrgName(sf)] = dict()
+            if os.path.exists(cachePath):
+                try:
+                    with open(cachePath) as cacheFile:
+                        orgDescribes.update(json.load(cacheFile))
+                except Exception as ex:
+                    logging.warning("Ignoring unreadable describe cache " + cachePath + ": " + str(ex))
+        cached = orgDescribes.get(sobject)
+    if cached is not None:
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(cached.get('described'))
+        if age < DESCRIBE_CACHE_MAX_AGE:
+            return cached.get('fields')
+
+    try:
+        logInfo("Describing " + sobject)
+        describe = getattr(sf, sobject).describe()
+        fields = dict()
+        for field in describe.get('fields'):
+            fields[field.get('name').lower()] = {'name': field.get('name'), 'type': field.get('type'),
+                                                 'createable': field.get('createable')}
+        with cacheLock:
+            orgDescribes[sobject] = {'described': datetime.datetime.now().isoformat(), 'fields': fields}
+            with open(cachePath, "w") as cacheFile:
+                json.dump(orgDescribes, cacheFile)
+        return fields
+    except Exception as ex:
+        logError("Could not describe " + sobject, ex)
+
+
+def coerceValue(value, fieldType):
+    """Converts a value read from Excel into the form Salesforce expects for the field's type
+
+    Parameters:
+        value (any) -- the value read from the worksheet
+        fieldType (string) -- the Salesforce type of the field (i.e. boolean, date, currency)
+
+    Returns:
+        (any) -- the converted value
+    """
+    if fieldType == 'boolean':
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', 'yes', 'y', '1', 'x')
+        return bool(value)
+    if fieldType == 'int':
+        return int(float(str(value).replace(',', '')))
+    if fieldType in ('double', 'currency', 'percent'):
+        return float(str(value).replace(',', ''))
+    if fieldType == 'date' and isinstance(value, str):
+        # Compiled payloads hold dates as ISO strings, which may still have a time part
+        return value[:10]
+    if fieldType == 'date' and isinstance(value, (datetime.datetime, datetime.date)):
+        # datetime is a subclass of date so a datetime needs its time removed first
+        return value.date().isoformat() if isinstance(value, datetime.datetime) else value.isoformat()
+    if fieldType == 'datetime' and isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if fieldType in TEXT_FIELD_TYPES:
+        # Excel stores numbers such as phone numbers and postal codes as floats
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    return value
+
+
+def prepareRecords(sf, records, sobject):
+    """Removes fields that don't exist or aren't createable, omits empty values and converts values using the field types
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        records (list of dict of string : any) -- the records to prepare
+        sobject (string) -- the object the records are of
+
+    Returns:
+        prepared (list of dict of string : any) -- the records with only the values that can be sent
+    """
+    fields = getDescribe(sf, sobject)
+    prepared = []
+    droppedFields = set()
+    for record in records:
+        preparedRecord = dict()
+        for key, value in record.items():
+            field = fields.get(key.lower())
+            if field is None or not field.get('createable'):
+                droppedFields.add(key)
+                continue
+            if value is None or (isinstance(value, str) and value.strip() == ""):
+                continue
+            try:
+                preparedRecord[field.get('name')] = coerceValue(value, field.get('type'))
+            except ValueError:
+                logging.warning("Omitting " + sobject + "." + field.get('name') + " value that is not a " +
+                                field.get('type') + ": " + str(value))
+        prepared.append(preparedRecord)
+    if droppedFields:
+        logInfo("Skipping " + sobject + " fields that don't exist or aren't createable: " +
+                ", ".join(sorted(droppedFields)))
+    return prepared
+
+
+def insertRecords(sf, stage, sobject, records):
+    """Prepares records against the object's describe, inserts them with the bulk API and records the created ids
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        stage (string) -- the load stage the records are created in (i.e. the worksheet name)
+        sobject (string) -- the object the records are of
+        records (list of dict of string : any) -- the records to insert
+
+    Returns:
+        sink (ResultSink) -- the number of records created and failed, and the ids of the created records
+    """
+    sink = ResultSink(stage, [record.pop(SOURCE_ROW_FIELD, None) for record in records])
+    settings = getLoadSettings(sf, sobject)
+    submitRecords(sf, "insert", sobject, prepareRecords(sf, records, sobject), settings.get('batchSize'), sink,
+                  settings.get('serial'), settings.get('concurrency'))
+    recordLoadedIds(sf, stage, sobject, sink.ids)
+    sink.logSummary()
+    return sink
+
+
+def submitRecords(sf, operation, sobject, records, batchSize, sink=None, serial=False, concurrency=1):
+    """Runs a bulk operation on records, submitting only as many at a time as the API budget allows
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        operation (string) -- the simple_salesforce bulk operation (i.e. insert, delete, hard_delete)
+        sobject (string) -- the object the records are of
+        records (list of dict of string : any) -- the records to submit
+        batchSize (integer) -- the number of records in each batch
+        sink (ResultSink) -- where to write the results of each submission instead of returning them
+        serial (boolean) -- whether each job's batches are processed one at a time instead of in parallel
+        concurrency (integer) -- the number of bulk jobs the records are split between and run at once
+
+    Returns:
+        results (list) -- the results of the bulk operation, or an empty list when they were written to the sink
+    """
+    results = []
+    start = 0
+    # Pauses in between submissions when the API budget runs out
+    while start < len(records):
+        # Splits what's left evenly between the jobs, keeping every job at least a batch and all of them a chunk
+        partRows = max(batchSize, min(RESULT_CHUNK_ROWS // concurrency,
+                                      math.ceil((len(records) - start) / concurrency)))
+        parts = []
+        while start < len(records) and len(parts) < concurrency:
+            # Only reserves budget for the records this part will send, so later parts aren't charged twice
+            allowed = limitTracker.reserve(sobject, min(len(records) - start, partRows), batchSize)
+            parts.append((start, records[start:start + allowed]))
+            start += allowed
+        try:
+            submissions = runJobs(sf, operation, sobject, parts, batchSize, serial)
+        finally:
+            # The jobs' requests have been counted off apiRemaining by now, so their reservations can go
+            for partStart, part in parts:
+                limitTracker.release(len(part), batchSize)
+        for (partStart, part), submitted in zip(parts, submissions):
+            if sink is not None:
+                sink.write(partStart, submitted)
+            else:
+                results.extend(submitted)
+    return results
+
+
+def runJobs(sf, operation, sobject, parts, batchSize, serial):
+    """Runs a bulk job for each part of the records at the same time
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        operation (string) -- the simple_salesforce bulk operation (i.e. insert, delete, hard_delete)
+        sobject (string) -- the object the records are of
+        parts (list of tuple of integer, list) -- the position of each part's first record and the part's records
+        batchSize (integer) -- the number of records in each batch
+        serial (boolean) -- whether each job's batches are processed one at a time instead of in parallel
+
+    Returns:
+        (list of list) -- the results of each part's job, in the same order as the parts
+    """
+    if asyncTransport is not None:
+        async def runAll():
+            return await asyncio.gather(*[asyncTransport.bulkOperation(operation, sobject, part, batchSize, serial)
+                                          for partStart, part in parts])
+        return asyncTransport.run(runAll())
+
+    bulkOperation = getattr(getattr(sf.bulk, sobject), operation)
+    # Only asks for serial jobs when needed so older simple_salesforce versions without use_serial still work
+    options = {'use_serial': True} if serial else {}
+    if len(parts) == 1:
+        return [bulkOperation(parts[0][1], batch_size=batchSize, **options)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(parts)) as executor:
+        return list(executor.map(lambda p: bulkOperation(p[1], batch_size=batchSize, **options), parts))
+
+
+class ResultSink:
+    """Appends the result of each record of a stage to the stage's results file, keeping only counts and ids"""
+
+    def __init__(self, stage, sourceRows):
+        """
+        Parameters:
+            stage (string) -- the load stage the records are created in, which names the results file
+            sourceRows (list of integer) -- the worksheet row each record was read from, in the order they're sent
+        """
+        self.stage = stage
+        self.sourceRows = sourceRows
+        self.path = os.path.join(getattr(loadContext, "resultsDirectory", RESULTS_DIRECTORY), stage + ".csv")
+        self.succeeded = 0
+        self.failed = 0
+        self.ids = []
+
+    def write(self, start, results):
+        """Appends the results of a submission to the results file
+
+        Parameters:
+            start (integer) -- the position of the submission's first record among the stage's records
+            results (list) -- the results of the bulk operation, in the order the records were sent
+
+        Returns:
+            void
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            newFile = not os.path.exists(self.path)
+            with open(self.path, "a", newline="") as resultsFile:
+                writer = csv.writer(resultsFile)
+                if newFile:
+                    writer.writerow(["run", "row", "success", "id", "errors"])
+                for position, result in enumerate(flattenResults(results), start):
+                    sourceRow = self.sourceRows[position] if position < len(self.sourceRows) else None
+                    errors = "; ".join(str(e.get('statusCode')) + ": " + str(e.get('message'))
+                                       for e in result.get('errors') or [])
+                    writer.writerow([runStarted, sourceRow, result.get('success'), result.get('id'), errors])
+                    if result.get('success') and result.get('id') is not None:
+                        self.succeeded += 1
+                        self.ids.append(result.get('id'))
+                    else:
+                        self.failed += 1
+        except Exception as ex:
+            logError("Could not write " + self.stage + " results", ex)
+
+    def logSummary(self):
+        """Logs how many records were created and where the failures can be found
+
+        Returns:
+            void
+        """
+        logInfo("Created " + str(self.succeeded) + " " + self.stage + " records" +
+                ("" if not self.failed else ", " + str(self.failed) + " failed (see " + self.path + ")"))
+
+
+class LimitTracker:
+    """Keeps the run within a share of the org's daily API request and bulk batch limits
+
+    The remaining requests are read from the Sforce-Limit-Info header of every response and from the /limits resource,
+    and submissions pause when the run's share has been used up.
+    """
+
+    def __init__(self, sf, share):
+        """
+        Parameters:
+            sf (Salesforce) -- the active Salesforce connection
+            share (float) -- the share (0 to 1) of the org's remaining requests and batches this run may use
+        """
+        self.sf = sf
+        self.share = share
+        # Batch mode's workers and the job threads all count requests and reserve batches on the same tracker. It's
+        # reentrant since refreshing makes a request, which the response hook counts
+        self.lock = threading.RLock()
+        self.calls = 0
+        self.batches = 0
+        # Requests set aside for jobs that are still running, which only come off apiRemaining as their responses arrive
+        self.reservedCalls = 0
+        self.apiMax = None
+        self.apiRemaining = None
+        self.batchMax = None
+        self.batchRemaining = None
+        # Counts every request made on the session, including the bulk API requests made by simple_salesforce
+        sf.session.hooks['response'].append(self.onResponse)
+        self.refresh()
+        # Whatever isn't part of this run's share when it starts is left for everyone else using the org
+        self.apiFloor = (1 - share) * self.apiRemaining
+        self.batchFloor = (1 - share) * self.batchRemaining
+
+    def onResponse(self, response, *args, **kwargs):
+        """Counts a request and reads the org's API usage from its Sforce-Limit-Info header when it has one"""
+        usage = re.search(r'api-usage=(\d+)/(\d+)', response.headers.get('Sforce-Limit-Info', ''))
+        with self.lock:
+            self.calls += 1
+            if usage:
+                self.apiMax = int(usage.group(2))
+                self.apiRemaining = self.apiMax - int(usage.group(1))
+            elif self.apiRemaining is not None:
+                self.apiRemaining -= 1
+
+    def refresh(self):
+        """Reads the org's remaining daily API requests and bulk batches from the /limits resource"""
+        try:
+            limits = self.sf.limits()
+            # Orgs on older API versions report bulk batches as DailyBulkApiRequests
+            bulkLimit = limits.get('DailyBulkApiBatches', limits.get('DailyBulkApiRequests'))
+            with self.lock:
+                self.apiMax = limits['DailyApiRequests']['Max']
+                self.apiRemaining = limits['DailyApiRequests']['Remaining']
+                self.batchMax = bulkLimit['Max']
+                self.batchRemaining = bulkLimit['Remaining']
+        except Exception as ex:
+            logError("Could not read the org's API limits", ex)
+
+    @staticmethod
+    def estimate(rows, batchSize):
+        """Estimates the requests and batches needed to bulk insert records and query the created ids
+
+        Parameters:
+            rows (integer) -- the number of records to insert
+            batchSize (integer) -- the number of records in each batch
+
+        Returns:
+            (tuple of integer, integer) -- the estimated number of API requests and bulk batches
+        """
+        batches = math.ceil(rows / batchSize)
+        # creating and closing the job, adding each batch, about two status checks per batch, getting each batch's
+        # results and querying the created records 2000 at a time
+        return 2 + batches * 4 + math.ceil(rows / 2000), batches
+
+    def planLoad(self, rowCounts):
+        """Logs the estimated requests and batches for each stage and warns when the load will need to pause
+
+        Parameters:
+            rowCounts (dict of string : integer) -- the number of records to load for each sheet or stage
+
+        Returns:
+            void
+        """
+        totalCalls = 0
+        totalBatches = 0
+        sobjects = dict(LOAD_STAGES)
+        for name, rows in rowCounts.items():
+            # Calibrated objects may load with a different batch size
+            batchSize = BATCH_SIZE
+            if name in sobjects:
+                batchSize = getLoadSettings(self.sf, sobjects.get(name)).get('batchSize')
+            calls, batches = self.estimate(rows, batchSize)
+            logging.info("Estimated " + str(calls) + " API requests and " + str(batches) + " bulk batches for " + name)
+            totalCalls += calls
+            totalBatches += batches
+        logInfo("Estimated " + str(totalCalls) + " API requests and " + str(totalBatches) + " bulk batches; " +
+                str(int(self.apiRemaining - self.apiFloor)) + " requests and " +
+                str(int(self.batchRemaining - self.batchFloor)) + " batches are available to this run")
+        if totalCalls > self.apiRemaining - self.apiFloor or totalBatches > self.batchRemaining - self.batchFloor:
+            logInfo("The load is larger than this run's share of the org's API limits and will pause when it runs out")
+
+    def reserve(self, sobject, rows, batchSize):
+        """Works out how many of the records can be submitted within the budget, pausing until at least one batch can
+
+        Parameters:
+            sobject (string) -- the object the records are of
+            rows (integer) -- the number of records waiting to be submitted
+            batchSize (integer) -- the number of records in each batch
+
+        Returns:
+            allowed (integer) -- the number of records that can be submitted now
+        """
+        for attempt in range(LIMIT_MAX_WAITS + 1):
+            # Checks and spends the budget in one step so two threads can't both spend the same requests or batches
+            with self.lock:
+                calls, batches = self.estimate(rows, batchSize)
+                callBudget = self.apiRemaining - self.apiFloor - self.reservedCalls
+                batchBudget = self.batchRemaining - self.batchFloor
+                if calls > callBudget or batches > batchBudget:
+                    # Fits in as many whole batches as the budget allows, leaving room for the job's fixed requests
+                    batches = int(min((callBudget - 3) // 4, batchBudget))
+                if batches > 0:
+                    allowed = min(rows, batches * batchSize)
+                    calls, batches = self.estimate(allowed, batchSize)
+                    self.reservedCalls += calls
+                    self.batches += batches
+                    self.batchRemaining -= batches
+                    return allowed
+            logInfo("This run's share of the org's API limits is used up, pausing " + str(LIMIT_WAIT_SECONDS) +
+                    " seconds before submitting more " + sobject + " records")
+            time.sleep(LIMIT_WAIT_SECONDS)
+            self.refresh()
+        logError("Stopped creating " + sobject + " records to stay within the org's API limits",
+                 Exception("No API budget available after waiting " + str(LIMIT_MAX_WAITS * LIMIT_WAIT_SECONDS) +
+                           " seconds"))
+
+    def release(self, rows, batchSize):
+        """Gives back the requests reserved for a job once its responses have been counted
+
+        Parameters:
+            rows (integer) -- the number of records the job was reserved for
+            batchSize (integer) -- the number of records in each batch
+
+        Returns:
+            void
+        """
+        calls, batches = self.estimate(rows, batchSize)
+        with self.lock:
+            self.reservedCalls -= calls
+
+    def logUsage(self):
+        """Writes the API requests and bulk batches this run used to the output and log file
+
+        Returns:
+            void
+        """
+        logInfo("API usage: " + str(self.calls) + " requests and " + str(self.batches) + " bulk batches this run, " +
+                str(self.apiMax - self.apiRemaining) + " of " + str(self.apiMax) + " daily API requests used in the org")
+
+
+def startLimitTracking(sf, share):
+    """Starts tracking the API limits used by the run
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        share (float) -- the share (0 to 1) of the org's remaining requests and batches this run may use
+
+    Returns:
+        void
+    """
+    global limitTracker
+    logInfo("Checking the org's API limits")
+    limitTracker = LimitTracker(sf, share)
+
+
+class AsyncTransport:
+    """Runs queries and bulk API jobs on one asyncio event loop over a pooled HTTP client
+
+    Every batch of a bulk job is uploaded, polled and has its results fetched concurrently, so many batches can be in
+    flight without a thread for each. Connections are kept alive and use HTTP/2 when the h2 package is installed. The
+    loop runs in its own thread so batch mode's workers can all share the transport.
+    """
+
+    def __init__(self, instance, sessionId, apiVersion):
+        """
+        Parameters:
+            instance (string) -- the host name of the org's instance
+            sessionId (string) -- the session id to authenticate with
+            apiVersion (string) -- the Salesforce API version to use (i.e. 59.0)
+        """
+        self.instance = instance
+        self.sessionId = sessionId
+        self.apiVersion = apiVersion
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = None
+
+    @classmethod
+    def fromSession(cls, sf):
+        """Creates a transport that uses the session of a simple_salesforce connection
+
+        Parameters:
+            sf (Salesforce) -- the active Salesforce connection
+
+        Returns:
+            (AsyncTransport) -- the transport
+        """
+        return cls(sf.sf_instance, sf.session_id, sf.sf_version)
+
+    def run(self, coroutine):
+        """Runs a coroutine on the transport's event loop from synchronous code, waiting for its result
+
+        Parameters:
+            coroutine (coroutine) -- the coroutine to run
+
+        Returns:
+            (any) -- the coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request over the pooled client, opening the client on first use
+
+        Parameters:
+            method (string) -- the HTTP method
+            url (string) -- the URL, relative to the org's instance
+            kwargs -- passed on to httpx
+
+        Returns:
+            (httpx.Response) -- the response, which has already been checked for an error status
+        """
+        if self.client is None:
+            hooks = [self.countResponse] if limitTracker is not None else []
+            self.client = httpx.AsyncClient(
+                base_url="https://" + self.instance, http2=HTTP2_AVAILABLE, timeout=ASYNC_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                                    max_keepalive_connections=ASYNC_MAX_CONNECTIONS),
+                event_hooks={'response': hooks})
+        response = await self.client.request(method, url, **kwargs)
+        if response.status_code >= 300:
+            await response.aread()
+            raise Exception(method + " " + url + " failed with status " + str(response.status_code) + ": " +
+                            response.text)
+        return response
+
+    @staticmethod
+    async def countResponse(response):
+        """Passes each response on to the limit tracker"""
+        limitTracker.onResponse(response)
+
+    def restHeaders(self):
+        """Gets the headers that authenticate a REST API request"""
+        return {'Authorization': 'Bearer ' + self.sessionId}
+
+    def bulkHeaders(self):
+        """Gets the headers that authenticate a bulk API request"""
+        return {'X-SFDC-Session': self.sessionId, 'Content-Type': 'application/json'}
+
+    async def query(self, soql):
+        """Runs a SOQL query, following nextRecordsUrl until every record has been read
+
+        Parameters:
+            soql (string) -- the query
+
+        Returns:
+            (dict of string : any) -- the query result with every record in records, like Salesforce.query_all
+        """
+        response = await self.request("GET", "/services/data/v" + self.apiVersion + "/query/",
+                                      params={'q': soql}, headers=self.restHeaders())
+        result = response.json()
+        records = result.get('records')
+        while not result.get('done'):
+            response = await self.request("GET", result.get('nextRecordsUrl'), headers=self.restHeaders())
+            result = response.json()
+            records.extend(result.get('records'))
+        return {'totalSize': len(records), 'done': True, 'records': records}
+
+    async def createJob(self, operation, sobject, useSerial=False):
+        """Creates a bulk API job
+
+        Parameters:
+            operation (string) -- the bulk operation (i.e. insert, delete, hardDelete)
+            sobject (string) -- the object the job is for
+            useSerial (boolean) -- whether the job's batches are processed one at a time
+
+        Returns:
+            (string) -- the job id
+        """
+        response = await self.request("POST", "/services/async/" + self.apiVersion + "/job",
+                                      headers=self.bulkHeaders(),
+                                      json={'operation': operation, 'object': sobject, 'contentType': 'JSON',
+                                            'concurrencyMode': 'Serial' if useSerial else 'Parallel'})
+        return response.json().get('id')
+
+    async def addBatch(self, jobId, records):
+        """Uploads records as a batch of a bulk API job
+
+        Returns:
+            (string) -- the batch id
+        """
+        response = await self.request("POST", "/services/async/" + self.apiVersion + "/job/" + jobId + "/batch",
+                                      headers=self.bulkHeaders(), content=json.dumps(records, default=str))
+        return response.json().get('id')
+
+    async def closeJob(self, jobId):
+        """Closes a bulk API job so Salesforce knows no more batches are coming"""
+        await self.request("POST", "/services/async/" + self.apiVersion + "/job/" + jobId,
+                           headers=self.bulkHeaders(), json={'state': 'Closed'})
+
+    async def pollBatch(self, jobId, batchId):
+        """Waits for a batch to finish processing
+
+        Returns:
+            (dict of string : any) -- the batch's final status
+        """
+        url = "/services/async/" + self.apiVersion + "/job/" + jobId + "/batch/" + batchId
+        while True:
+            status = (await self.request("GET", url, headers=self.bulkHeaders())).json()
+            if status.get('state') in ('Completed', 'Failed', 'NotProcessed'):
+                return status
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+
+    async def batchResults(self, jobId, batchId):
+        """Gets the result of each record in a finished batch
+
+        Returns:
+            (list of dict of string : any) -- the result of each record, in the order they were sent
+        """
+        url = "/services/async/" + self.apiVersion + "/job/" + jobId + "/batch/" + batchId + "/result"
+        return (await self.request("GET", url, headers=self.bulkHeaders())).json()
+
+    async def runBatch(self, jobId, records):
+        """Uploads a batch, waits for it to finish and gets its results"""
+        batchId = await self.addBatch(jobId, records)
+        status = await self.pollBatch(jobId, batchId)
+        if status.get('state') != 'Completed':
+            raise Exception("Batch " + batchId + " " + status.get('state') + ": " + str(status.get('stateMessage')))
+        return await self.batchResults(jobId, batchId)
+
+    async def bulkOperation(self, operation, sobject, records, batchSize, useSerial=False):
+        """Runs a bulk API job with all of its batches in flight at once
+
+        Parameters:
+            operation (string) -- the simple_salesforce name of the bulk operation (i.e. insert, hard_delete)
+            sobject (string) -- the object the records are of
+            records (list of dict of string : any) -- the records to submit
+            batchSize (integer) -- the number of records in each batch
+            useSerial (boolean) -- whether the org processes the job's batches one at a time
+
+        Returns:
+            (list of dict of string : any) -- the result of each record, in the order they were sent
+        """
+        jobId = await self.createJob("hardDelete" if operation == "hard_delete" else operation, sobject, useSerial)
+        try:
+            batches = [records[i:i + batchSize] for i in range(0, len(records), batchSize)]
+            results = await asyncio.gather(*[self.runBatch(jobId, batch) for batch in batches])
+        finally:
+            await self.closeJob(jobId)
+        return [r for batchResults in results for r in batchResults]
+
+    def close(self):
+        """Closes the pooled client and the event loop"""
+        if self.client is not None:
+            self.run(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def startAsyncTransport(sf):
+    """Starts sending queries and bulk jobs over the async transport, using the logged in session
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+
+    Returns:
+        void
+    """
+    global asyncTransport
+    if httpx is None:
+        logError("Could not start the async transport", Exception("--transport async needs the httpx package"))
+    logInfo("Using the async transport" + (" over HTTP/2" if HTTP2_AVAILABLE else ""))
+    asyncTransport = AsyncTransport.fromSession(sf)
+
+
+def querySalesforce(sf, q):
+    """Runs a SOQL query, returning every matching record
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        q (string) -- the query
+
+    Returns:
+        (dict of string : any) -- the query result, with the records in records
+    """
+    if asyncTransport is not None:
+        return asyncTransport.run(asyncTransport.query(q))
+    return sf.query_all(q)
+
+
+def getUsers(sf, wb, createOrQuery):
+    """Checks if the user wants to create users or not. If not, queries existing users instead
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- The workbook containing the test data to create
+        createOrQuery (string) -- True to create the users, False to query them
+
+    Returns:
+        (dict of string : string) -- A dictionary of users where the name is the key and the Id is the value
+    """
+    if (createOrQuery.lower() == "true"):
+        return createUsers(sf, wb)
+    else:
+        return queryUsers(sf, wb)
+
+
+def queryUsers(sf, wb):
+    ws = wb["Users"]
+    userNames = []
+    try:
+        logInfo("Reading users from Excel")
+        for name in ws.iter_rows(min_row=2, max_col=2, values_only=True):
+            if (name[0] != None and name[1] != None):
+                userNames.append(name[0] + " " + name[1])
+    except Exception as ex:
+        logError("Could not read users", ex)
+
+    return getLookupIds(sf, "users", userNames)
+
+
+def queryUsersByName(sf, userNames):
+    """Queries existing users by their full names
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        userNames (list of string) -- the full names of the users
+
+    Returns:
+        (dict of string : string) -- A dictionary of users where the name is the key and the Id is the value
+    """
+    try:
+        logInfo("Querying users")
+        users = querySalesforce(sf, format_soql("SELECT Id, Name FROM User WHERE Name IN {names}", names=userNames))
+        return createRecordMap(users, "User")
+    except Exception as ex:
+        logError("Could not query users", ex)
+
+
+def getUsernameSuffix(sf):
+    """Gets the suffix added to usernames to keep them unique across sandboxes
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+
+    Returns:
+        orgName (string) -- a period followed by the sandbox name
+    """
+    try:
+        logInfo("Getting user to set username")
+        instance = sf.sf_instance
+        orgName = '.' + instance.replace('.my.salesforce.com', '').replace('westernsouthernfinancialgroup--', '')
+        return orgName
+    except Exception as ex:
+        logError("Could not get user", ex)
+
+
+def buildUsers(ws, orgName, profileMap, roleMap):
+    """Reads users into the records to create
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        orgName (string) -- the suffix added to each username to keep it unique across sandboxes
+        profileMap (dict of string : string) -- the profiles by name
+        roleMap (dict of string : string) -- the roles by name
+
+    Returns:
+        insertUsers (list of dict of string : any) -- the users to create
+    """
+    insertUsers = []
+    try:
+        logInfo("Reading users from Excel")
+        for rowNumber, row in iterSourceRows(ws):
+            if (row[0] == None):
+                continue
+            insertUsers.append(
+                {SOURCE_ROW_FIELD: rowNumber, 'FirstName': row[0],
+                 'LastName': row[1],
+                 'Username': str(row[2]) + orgName, 'Email': row[3],
+                 'Title': row[4],
+                 'ProfileId': profileMap.get(row[5]),
+                 'UserRoleId': roleMap.get(row[6]),
+                 # creates alias from first character of first name and the first seven characters of the last name. Slicing a string shorter than seven characters doesn't cause an out of bounds exception
+                 'Alias': str(row[0][0]) + str(row[1][0:7]),
+                 'IsActive': True, 'TimeZoneSidKey': 'America/New_York', 'LocaleSidKey': 'en_US',
+                 'EmailEncodingKey': 'UTF-8', 'LanguageLocaleKey': 'en_US'})
+    except Exception as ex:
+        logError("Could not read users", ex)
+    return insertUsers
+
+
+def createUsers(sf, wb):
+    """Creates users in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- The workbook containing the test data to create
+
+    Returns:
+        user (dict of string : string) -- a dictionary of the created users with Name as the key and Id as the value
+    """
+    orgName = getUsernameSuffix(sf)
+    ws = wb["Users"]
+    try:
+        profileNames = set()
+        roleNames = set()
+        for row in ws.iter_rows(min_row=2, min_col=6, max_col=7, values_only=True):
+            row = tuple(row) + (None,) * (2 - len(row))
+            profileNames.add(row[0])
+            roleNames.add(row[1])
+    except Exception as ex:
+        logError("Could not read profiles and roles", ex)
+    # Only queries the profiles and roles that weren't prefetched or looked up for an earlier workbook
+    profileMap = getLookupIds(sf, "Profile", profileNames)
+    roleMap = getLookupIds(sf, "UserRole", roleNames)
+
+    insertUsers = buildUsers(ws, orgName, profileMap, roleMap)
+    try:
+        logInfo("Creating users")
+        users = insertRecords(sf, "Users", "User", insertUsers)
+        logInfo("Created users")
+        return queryCreatedRecords(sf, users.ids, "User")
+    except Exception as ex:
+        logError("Could not create users", ex)
+
+
+def buildParentAccounts(ws, users, recordTypeMap):
+    """Reads parent accounts into the records to create
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        recordTypeMap (dict of string : string) -- the record types by name
+
+    Returns:
+        insertParentAccounts (list of dict of string : any) -- the parent accounts to create
+    """
+    insertParentAccounts = []
+    try:
+        logInfo("Reading Parent Accounts from Excel")
+        for rowNumber, row in iterSourceRows(ws):
+            if (row[0] == None):
+                continue
+            insertParentAccounts.append(
+                {SOURCE_ROW_FIELD: rowNumber, 'Name': row[0],
+                 'EEP_Legal_Name_Of_Business__c': row[1],
+                 'RecordTypeId': recordTypeMap.get(row[2]),
+                 'OwnerId': users.get(row[3]),
+                 'BillingStreet': row[4], 'BillingCity': row[5], 'BillingState': row[6],
+                 'BillingPostalCode': row[7], 'BillingCountry': row[8],
+                 'Phone': row[9], 'EEP_Other_Phone__c': row[10], 'Fax': row[11],
+                 'EEP_Restricted_Access__c': row[12],
+                 'EEP_Producer_Account_Tax_Id__c': row[14], 'Website': row[15], 'NumberOfEmployees': row[16],
+                 'FinServ__ClientCategory__c': row[17], 'FinServ__Status__c': row[18],
+                 'FinServ__PersonalInterests__c': row[19], 'FinServ__MarketingSegment__c': row[20],
+                 'FinServ__FinancialInterests__c': row[21], 'FinServ__ServiceModel__c': row[22],
+                 'FinServ__ReviewFrequency__c': row[23], 'FinServ__InvestmentExperience__c': row[24],
+                 'FinServ__InvestmentObjectives__c': row[25]})
+        logging.info("Read " + str(len(insertParentAccounts)) + " Parent Accounts")
+    except Exception as ex:
+        logError("Could not read Parent Accounts", ex)
+    return insertParentAccounts
+
+
+def createParentAccounts(sf, users, wb):
+    """Creates parent accounts in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the users to assign ownership of the parent accounts to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+
+    Returns:
+        parentAccounts (dict of string : string) -- a dictionary of the created parent accounts with Name as the key and Id as the value
+    """
+    ws = wb["ParentAccounts"]  # Gets the ParentAccounts sheet
+    recordTypeMap = getRecordTypes(sf, ws, 3, "Account")
+    insertParentAccounts = buildParentAccounts(ws, users, recordTypeMap)
+    try:
+        logInfo("Creating Parent Accounts")
+        parentAccounts = insertRecords(sf, "ParentAccounts", "Account", insertParentAccounts)
+        logInfo("Created Parent Accounts")
+        return queryCreatedRecords(sf, parentAccounts.ids, "Account")
+    except Exception as ex:
+        logError("Could not create Parent Accounts", ex)
+
+
+def buildChildAccounts(ws, users, parentAccounts, recordTypeMap):
+    """Reads child accounts into the records to create
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        parentAccounts (dict of string : string) -- the accounts that will have child accounts in test data
+        recordTypeMap (dict of string : string) -- the record types by name
+
+    Returns:
+        insertChildAccounts (list of dict of string : any) -- the child accounts to create
+    """
+    insertChildAccounts = []
+    try:
+        logInfo("Reading Child Accounts from Excel")
+        for rowNumber, row in iterSourceRows(ws):
+            if (row[0] == None):
+                continue
+            insertChildAccounts.append(
+                {SOURCE_ROW_FIELD: rowNumber, 'Name': row[0],
+                 'EEP_Legal_Name_Of_Business__c': row[1],
+                 'RecordTypeId': recordTypeMap.get(row[2]),
+                 'OwnerId': users.get(row[3]),
+                 'BillingStreet': row[4], 'BillingCity': row[5], 'BillingState': row[6],
+                 'BillingPostalCode': row[7], 'BillingCountry': row[8],
+                 'Phone': row[9], 'EEP_Other_Phone__c': row[10], 'Fax': row[11],
+                 'EEP_Restricted_Access__c': row[12],
+                 'ParentId': parentAccounts.get(row[13]),
+                 'EEP_Producer_Account_Tax_Id__c': row[14], 'Website': row[15], 'NumberOfEmployees': row[16],
+                 'FinServ__ClientCategory__c': row[17], 'FinServ__Status__c': row[18],
+                 'FinServ__PersonalInterests__c': row[19], 'FinServ__MarketingSegment__c': row[20],
+                 'FinServ__FinancialInterests__c': row[21], 'FinServ__ServiceModel__c': row[22],
+                 'FinServ__ReviewFrequency__c': row[23], 'FinServ__InvestmentExperience__c': row[24],
+                 'FinServ__InvestmentObjectives__c': row[25]})
+        logging.info("Read " + str(len(insertChildAccounts)) + " Child Accounts")
+    except Exception as ex:
         logError("Could not read Child Accounts", ex)
+    return insertChildAccounts
+
+
+def levelChildAccounts(ws):
+    """Splits child accounts into levels of the account hierarchy, so every account's parent is in an earlier level
+
+    A child account whose parent is a parent account, or isn't in the workbook, is in the first level, and one whose
+    parent is another child account is in the level after its parent's.
 
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the child accounts from
+
+    Returns:
+        levels (list of ParsedSheet) -- the header and rows of each level, starting with the top of the hierarchy
+    """
+    levels = []
     try:
-        logInfo("Creating Child Accounts")
-        childAccounts = sf.bulk.Account.insert(insertChildAccounts, batch_size=100)
-        logInfo("Created Child Accounts")
-        logging.info(childAccounts)
-        return queryCreatedRecords(sf, childAccounts, "Account")
+        logInfo("Reading Child Account hierarchy from Excel")
+        header = next(ws.iter_rows(max_row=1, values_only=True), ())
+        rows = [(rowNumber, row) for rowNumber, row in iterSourceRows(ws) if row[0] != None]
+        parents = dict((row[0], row[13]) for rowNumber, row in rows)
+        depths = dict()
+        for name in parents:
+            # Walks up to the nearest account with a known depth, then numbers the accounts on the way back down
+            chain = []
+            seen = set()
+            current = name
+            while current in parents and current not in depths:
+                if current in seen:
+                    raise ValueError("Child Account " + str(current) + " is its own ancestor")
+                chain.append(current)
+                seen.add(current)
+                current = parents[current]
+            depth = depths.get(current, -1)
+            for ancestor in reversed(chain):
+                depth += 1
+                depths[ancestor] = depth
+        levelRows = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+        for rowNumber, row in rows:
+            levelRows[depths[row[0]]].append((rowNumber, row))
+        levels = [ParsedSheet(ws.title, [header] + [row for rowNumber, row in r],
+                              [1] + [rowNumber for rowNumber, row in r]) for r in levelRows]
+        logInfo("Read " + str(len(levels)) + " levels of Child Accounts")
     except Exception as ex:
-        logError("Could not create Child Accounts", ex)
+        logError("Could not read Child Account hierarchy", ex)
+    return levels
 
 
-def createPersonAccounts(sf, users, wb):
-    """Creates person accounts in the target org
+def createChildAccounts(sf, users, parentAccounts, wb):
+    """Creates child accounts in the target org a level of the account hierarchy at a time
+
+    Each level is submitted as one bulk job once the ids of the level above it are known, so a child account's parent
+    can be a parent account or another child account.
 
     Parameters:
         sf (Salesforce) -- the active Salesforce connection
         users (dict of string : string) -- the users to assign ownership of the accounts to
+        parentAccounts (dict of string: string) -- the accounts that will have child accounts in test data
         wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
 
     Returns:
-        personAccounts (dict of string : string) -- a dictionary of the created person accounts with Name as the key and Id as the value
+        childAccounts (dict of string : string) -- a dictionary of the created accounts with Name as the key and Id as the value
     """
-    ws = wb["PersonAccounts"]  # Gets the PersonAccounts sheet
+    ws = wb["ChildAccounts"]  # Gets the ChildAccounts sheet
     recordTypeMap = getRecordTypes(sf, ws, 3, "Account")
+    levels = levelChildAccounts(ws)
+
+    try:
+        logInfo("Creating Child Accounts")
+        childAccounts = dict()
+        for level, levelSheet in enumerate(levels, 1):
+            insertChildAccounts = buildChildAccounts(levelSheet, users, {**parentAccounts, **childAccounts},
+                                                     recordTypeMap)
+            logInfo("Creating level " + str(level) + " of " + str(len(levels)) + " of Child Accounts")
+            results = insertRecords(sf, "ChildAccounts", "Account", insertChildAccounts)
+            childAccounts.update(queryCreatedRecords(sf, results.ids, "Account"))
+        logInfo("Created Child Accounts")
+        return childAccounts
+    except Exception as ex:
+        logError("Could not create Child Accounts", ex)
+
+
+def buildPersonAccounts(ws, users, recordTypeMap):
+    """Reads person accounts into the records to create
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        recordTypeMap (dict of string : string) -- the record types by name
+
+    Returns:
+        insertPersonAccounts (list of dict of string : any) -- the person accounts to create
+    """
     insertPersonAccounts = []
     try:
         logInfo("Reading Person Accounts from Excel")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertPersonAccounts.append(
-                {'EEP_Legal_Name_Of_Business__c': u"" if row[1] is None else row[1], 'RecordTypeId': recordTypeMap.get(
-                    row[2]),
+                {SOURCE_ROW_FIELD: rowNumber, 'EEP_Legal_Name_Of_Business__c': row[1],
+                 'RecordTypeId': recordTypeMap.get(row[2]),
                  'OwnerId': users.get(row[3]),
-                 'BillingStreet': u"" if row[4] is None else row[4], 'BillingCity': u"" if row[5] is None else row
-                 [5], 'BillingState': u"" if row[6] is None else row[6], 'BillingPostalCode': u""
-                 if row[7] is None else row[7], 'BillingCountry': u"" if row[8] is None else row[8], 'Phone': u""
-                 if row[9] is None else row[9], 'EEP_Other_Phone__c': u"" if row[10] is None else row[10], 'Fax': u""
-                 if row[11] is None else row[11], 'EEP_Restricted_Access__c': u"" if row[12] is None else row[12],
-                 'EEP_Producer_Account_Tax_Id__c': u"" if row[14] is None else row[14], 'Website': u""
-                 if row[15] is None else row[15], 'NumberOfEmployees': u"" if row[16] is None else row[16],
-                 'FinServ__ClientCategory__c': u"" if row[17] is None else row[17], 'FinServ__Status__c': u""
-                 if row[18] is None else row[18], 'FinServ__PersonalInterests__c': u"" if row[19] is None else row
-                 [19], 'FinServ__MarketingSegment__c': u"" if row[20] is None else row[20],
-                 'FinServ__FinancialInterests__c': u"" if row[21] is None else row[21], 'FinServ__ServiceModel__c': u""
-                 if row[22] is None else row[22], 'FinServ__ReviewFrequency__c': u"" if row[23] is None else row[23],
-                 'FinServ__InvestmentExperience__c': u"" if row[24] is None else row[24],
-                 'FinServ__InvestmentObjectives__c': u"" if row[25] is None else row[25], 'Salutation': u""
-                 if row[26] is None else row[26], 'FirstName': u"" if row[27] is None else row[27], 'LastName': u""
-                 if row[28] is None else row[28], 'MiddleName': u"" if row[29] is None else row[29], 'Suffix': u""
-                 if row[30] is None else row[30], 'PersonEmail': u"" if row[31] is None else row[31], 'Industry': u""
-                 if row[32] is None else row[32]})
-        logging.info(insertPersonAccounts)
+                 'BillingStreet': row[4], 'BillingCity': row[5], 'BillingState': row[6],
+                 'BillingPostalCode': row[7], 'BillingCountry': row[8],
+                 'Phone': row[9], 'EEP_Other_Phone__c': row[10], 'Fax': row[11],
+                 'EEP_Restricted_Access__c': row[12],
+                 'EEP_Producer_Account_Tax_Id__c': row[14], 'Website': row[15], 'NumberOfEmployees': row[16],
+                 'FinServ__ClientCategory__c': row[17], 'FinServ__Status__c': row[18],
+                 'FinServ__PersonalInterests__c': row[19], 'FinServ__MarketingSegment__c': row[20],
+                 'FinServ__FinancialInterests__c': row[21], 'FinServ__ServiceModel__c': row[22],
+                 'FinServ__ReviewFrequency__c': row[23], 'FinServ__InvestmentExperience__c': row[24],
+                 'FinServ__InvestmentObjectives__c': row[25],
+                 'Salutation': row[26], 'FirstName': row[27], 'LastName': row[28], 'MiddleName': row[29],
+                 'Suffix': row[30], 'PersonEmail': row[31], 'Industry': row[32]})
+        logging.info("Read " + str(len(insertPersonAccounts)) + " Person Accounts")
     except Exception as ex:
         logError("Could not read Person Accounts", ex)
+    return insertPersonAccounts
+
+
+def createPersonAccounts(sf, users, wb):
+    """Creates person accounts in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the users to assign ownership of the accounts to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+
+    Returns:
+        personAccounts (dict of string : string) -- a dictionary of the created person accounts with Name as the key and Id as the value
+    """
+    ws = wb["PersonAccounts"]  # Gets the PersonAccounts sheet
+    recordTypeMap = getRecordTypes(sf, ws, 3, "Account")
+    insertPersonAccounts = buildPersonAccounts(ws, users, recordTypeMap)
 
     try:
         logInfo("Creating Person Accounts")
-        personAccounts = sf.bulk.Account.insert(insertPersonAccounts, batch_size=100)
+        personAccounts = insertRecords(sf, "PersonAccounts", "Account", insertPersonAccounts)
         logInfo("Created Person Accounts")
-        logging.info(personAccounts)
-        return queryCreatedRecords(sf, personAccounts, "Account")
+        return queryCreatedRecords(sf, personAccounts.ids, "Account")
     except Exception as ex:
         logError("Could not create Person Accounts", ex)
 
 
+def buildContacts(ws, users, recordTypeMap):
+    """Reads contacts into the records to create
+
+    Parameters:
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        recordTypeMap (dict of string : string) -- the record types by name
+
+    Returns:
+        insertContacts (list of dict of string : any) -- the contacts to create
+    """
+    insertContacts = []
+    try:
+        logInfo("Reading Contacts")
+        for rowNumber, row in iterSourceRows(ws):
+            if (row[0] == None):
+                continue
+            insertContacts.append({SOURCE_ROW_FIELD: rowNumber, 'FirstName': row[0], 'LastName': row[1],
+                                   'RecordTypeId': recordTypeMap.get(row[2]), 'OwnerId': users.get(row[3])})
+        logging.info("Read " + str(len(insertContacts)) + " Contacts")
+    except Exception as ex:
+        logError("Could not read Contacts", ex)
+    return insertContacts
+
+
 def createContacts(sf, users, wb):
     """Creates contacts in the target org
 
@@ -461,140 +2054,155 @@ def createContacts(sf, users, wb):
     """
     ws = wb["Contacts"]  # Gets the Contacts sheet
     recordTypeMap = getRecordTypes(sf, ws, 3, "Contact")
-    insertContacts = []
-    try:
-        logInfo("Reading Contacts")
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if (row[0] == None):
-                continue
-            insertContacts.append({'FirstName': row[0], 'LastName': row[1], 'RecordTypeId': recordTypeMap.get(
-                row[2]), 'OwnerId': users.get(row[3])})
-            logging.info(insertContacts)
-    except Exception as ex:
-        logError("Could not read Contacts", ex)
+    insertContacts = buildContacts(ws, users, recordTypeMap)
 
     try:
         logInfo("Creating Contacts")
-        contacts = sf.bulk.Contact.insert(insertContacts, batch_size=100)
+        contacts = insertRecords(sf, "Contacts", "Contact", insertContacts)
         logInfo("Created Contacts")
-        logging.info(contacts)
-        return queryCreatedRecords(sf, contacts, "Contact")
+        return queryCreatedRecords(sf, contacts.ids, "Contact")
     except Exception as ex:
         logError("Could not create Contacts", ex)
 
 
-def createProducers(sf, users, wb, accounts, contacts):
-    """Creates producers in the target org
+def buildProducers(ws, users, accounts, contacts):
+    """Reads producers into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the user to assign ownership of the producers to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
-        accounts (dict of string : string) -- the accounts to relate the producers to
-        contacts (dict of string : string) -- the contacts to relate the producers to
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        accounts (dict of string : string) -- the accounts to relate the records to
+        contacts (dict of string : string) -- the contacts to relate the records to
 
     Returns:
-        producers (dict of string : string) -- a dictionary of the created producers with Name as the key and Id as the value
+        insertProducers (list of dict of string : any) -- the producers to create
     """
-    ws = wb["Producers"]
     insertProducers = []
     try:
         logInfo("Reading Producers")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertProducers.append(
-                {'Name': row[0],
+                {SOURCE_ROW_FIELD: rowNumber, 'Name': row[0],
                  'AccountId': accounts.get(row[1]),
                  'ContactId': contacts.get(row[2]),
                  # converts the date into a standardized datetime string then removes the time part due to the field only being a date field
-                 'EEP_Producer_Contract_Date__c': str(row[3].isoformat()).replace('T00:00:00', ''),
+                 'EEP_Producer_Contract_Date__c': row[3],
                  'EEP_Producer_Id__c': row[4],
                  'OwnerId': users.get(row[5])})
-            logging.info(insertProducers)
+        logging.info("Read " + str(len(insertProducers)) + " Producers")
     except Exception as ex:
         logError("Could not read Producers", ex)
+    return insertProducers
+
+
+def createProducers(sf, users, wb, accounts, contacts):
+    """Creates producers in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the user to assign ownership of the producers to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        accounts (dict of string : string) -- the accounts to relate the producers to
+        contacts (dict of string : string) -- the contacts to relate the producers to
+
+    Returns:
+        producers (dict of string : string) -- a dictionary of the created producers with Name as the key and Id as the value
+    """
+    ws = wb["Producers"]
+    insertProducers = buildProducers(ws, users, accounts, contacts)
 
     try:
         logInfo("Creating Producers")
-        producers = sf.bulk.Producer.insert(insertProducers, batch_size=100)
+        producers = insertRecords(sf, "Producers", "Producer", insertProducers)
         logInfo("Created Producers")
-        logging.info(producers)
-        return queryCreatedRecords(sf, producers, "Producer")
+        return queryCreatedRecords(sf, producers.ids, "Producer")
     except Exception as ex:
         logError("Could not create Producers", ex)
 
 
-def createLeads(sf, users, wb, accounts):
-    """Creates Leads in the target org
+def buildLeads(ws, users, accounts, recordTypeMap):
+    """Reads Leads into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the user to assign ownership of the Leads to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
-        accounts (dict of string : string) -- the accounts to relate the Leads to
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        accounts (dict of string : string) -- the accounts to relate the records to
+        recordTypeMap (dict of string : string) -- the record types by name
 
     Returns:
-        void
+        insertLeads (list of dict of string : any) -- the Leads to create
     """
-    ws = wb["Leads"]  # Gets the Leads sheet
-    recordTypeMap = getRecordTypes(sf, ws, 1, "Lead")
     insertLeads = []
     try:
         logInfo("Reading Leads")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertLeads.append(
-                {'RecordTypeId': recordTypeMap.get(row[0]), 'OwnerId': users.get(row[1]),
-                 'Salutation': u"" if row[2] is None else row[2], 'FirstName': u"" if row[3] is None else row[3], 'LastName': u""
-                 if row[4] is None else row[4], 'MiddleName': u"" if row[5] is None else row[5], 'Suffix': u"" if row[6] is None else row[6],
-                 'EEP_Preferred_Name__c': u"" if row[7] is None else row[7], 'Company': row[8], 'EEP_Gender__c': row[9], 'Email': row[10],
+                {SOURCE_ROW_FIELD: rowNumber, 'RecordTypeId': recordTypeMap.get(row[0]), 'OwnerId': users.get(row[1]),
+                 'Salutation': row[2], 'FirstName': row[3], 'LastName': row[4], 'MiddleName': row[5], 'Suffix': row[6],
+                 'EEP_Preferred_Name__c': row[7], 'Company': row[8], 'EEP_Gender__c': row[9], 'Email': row[10],
                  'phone': row[11], 'MobilePhone': row[12], 'EEP_Preferred_Day__c': row[13],
-                 'EEP_Producer_Account_Tax_Id__c': u"" if row[15] is None else row[15], 'EEP_National_Producer_Number__c': u"" if row[16] is None else row[16],
-                 'EEP_Producer_CBU__c': row[17], 'EEP_Producer_Distribution_Channel__c': u"" if row[18] is None else row[18],
+                 'EEP_Producer_Account_Tax_Id__c': row[15], 'EEP_National_Producer_Number__c': row[16],
+                 'EEP_Producer_CBU__c': row[17], 'EEP_Producer_Distribution_Channel__c': row[18],
                  'Status': row[19], 'EEP_Closed_Lost_Reason__c': row[20],
-                 'LeadSource': row[21], 'EEP_Source_Campaign__c': u"" if row[22] is None else row[22],
+                 'LeadSource': row[21], 'EEP_Source_Campaign__c': row[22],
                  'EEP_Restricted_Access__c': row[23], 'EEP_Firm_Segment__c': row[24], 'HasOptedOutOfEmail': row[25],
-                 'Street': u"" if row[26] is None else row[26], 'City': u"" if row[27] is None else row[27],
-                 'State': u"" if row[28] is None else row[28], 'PostalCode': u"" if row[29] is None else row[29],
-                 'Country': u"" if row[30] is None else row[30], 'FinServ__RelatedAccount__c': accounts.get(row[31]),
+                 'Street': row[26], 'City': row[27], 'State': row[28], 'PostalCode': row[29],
+                 'Country': row[30], 'FinServ__RelatedAccount__c': accounts.get(row[31]),
                  'FinServ__ReferredByUser__c': users.get(row[32]), 'EEP_Date_Of_Birth__c': "1970-05-09"})
-            logging.info(insertLeads)
+        logging.info("Read " + str(len(insertLeads)) + " Leads")
     except Exception as ex:
         logError("Could not read Leads", ex)
+    return insertLeads
+
+
+def createLeads(sf, users, wb, accounts):
+    """Creates Leads in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the user to assign ownership of the Leads to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        accounts (dict of string : string) -- the accounts to relate the Leads to
+
+    Returns:
+        void
+    """
+    ws = wb["Leads"]  # Gets the Leads sheet
+    recordTypeMap = getRecordTypes(sf, ws, 1, "Lead")
+    insertLeads = buildLeads(ws, users, accounts, recordTypeMap)
 
     try:
         logInfo("Creating Leads")
-        Leads = sf.bulk.Lead.insert(insertLeads, batch_size=100)
+        insertRecords(sf, "Leads", "Lead", insertLeads)
         logInfo("Created Leads")
-        logging.info(Leads)
     except Exception as ex:
         logError("Could not create Leads", ex)
 
 
-def createOpportunities(sf, users, wb, accounts):
-    """Creates Opportunities in the target org
+def buildOpportunities(ws, users, accounts, recordTypeMap):
+    """Reads Opportunities into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the user to assign ownership of the Opportunities to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
-        accounts (dict of string : string) -- the accounts to relate the Opportunities to
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        accounts (dict of string : string) -- the accounts to relate the records to
+        recordTypeMap (dict of string : string) -- the record types by name
 
     Returns:
-        void
+        insertOpportunities (list of dict of string : any) -- the Opportunities to create
     """
-    ws = wb["Opportunities"]  # Gets the Opportunities sheet
-    recordTypeMap = getRecordTypes(sf, ws, 1, "Opportunity")
     insertOpportunities = []
     try:
         logInfo("Reading Opportunities")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertOpportunities.append(
-                {'RecordTypeId': recordTypeMap.get(row[0]),
+                {SOURCE_ROW_FIELD: rowNumber, 'RecordTypeId': recordTypeMap.get(row[0]),
                  'OwnerId': users.get(row[1]),
                  'AccountId': accounts.get(row[2]),
                  'Name': row[3],
@@ -602,118 +2210,162 @@ def createOpportunities(sf, users, wb, accounts):
                  'Budget_Confirmed__c': row[5],
                  'Discovery_Completed__c': row[6],
                  'ROI_Analysis_Completed__c': row[7],
-                 'CloseDate': str(row[9]).replace(' 00:00:00', ''),
+                 'CloseDate': row[9],
                  'StageName': row[10],
                  'Amount': 0 if row[12] is None else row[12],
                  'LeadSource': row[13],
                  'EEP_Producer_CBU__c': row[14],
                  'EEP_Producer_Distribution_Channel__c': row[15],
                  'EEP_Restricted_Access__c': row[16]})
-            logging.info(insertOpportunities)
+        logging.info("Read " + str(len(insertOpportunities)) + " Opportunities")
     except Exception as ex:
         logError("Could not read Opportunities", ex)
+    return insertOpportunities
+
+
+def createOpportunities(sf, users, wb, accounts):
+    """Creates Opportunities in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the user to assign ownership of the Opportunities to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        accounts (dict of string : string) -- the accounts to relate the Opportunities to
+
+    Returns:
+        void
+    """
+    ws = wb["Opportunities"]  # Gets the Opportunities sheet
+    recordTypeMap = getRecordTypes(sf, ws, 1, "Opportunity")
+    insertOpportunities = buildOpportunities(ws, users, accounts, recordTypeMap)
 
     try:
         logInfo("Creating Opportunities")
-        Opportunities = sf.bulk.Opportunity.insert(insertOpportunities, batch_size=100)
+        insertRecords(sf, "Opportunities", "Opportunity", insertOpportunities)
         logInfo("Created Opportunities")
-        logging.info(Opportunities)
     except Exception as ex:
         logError("Could not create Opportunities", ex)
 
 
-def createTasks(sf, users, wb, accounts, contacts):
-    """Creates Tasks in the target org
+def buildTasks(ws, users, accounts, contacts):
+    """Reads Tasks into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the user to assign ownership of the Tasks to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
-        accounts (dict of string : string) -- the accounts to relate the Tasks to
-        contacts (dict of string : string) -- the contacts to relate the Tasks to
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        users (dict of string : string) -- the users to assign ownership of the records to
+        accounts (dict of string : string) -- the accounts to relate the records to
+        contacts (dict of string : string) -- the contacts to relate the records to
 
     Returns:
-        void
+        insertTasks (list of dict of string : any) -- the Tasks to create
     """
-    ws = wb["Tasks"]
     insertTasks = []
     try:
         logInfo("Reading Tasks")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertTasks.append(
-                {'Subject': row[0],
+                {SOURCE_ROW_FIELD: rowNumber, 'Subject': row[0],
                  'Type': row[1],
                  'WhoId': contacts.get(row[2]),
                  # converts the date into a standardized datetime string then removes the time part due to the field only being a date field
-                 'ActivityDate': str(row[3].isoformat()).replace('T00:00:00', ''),
+                 'ActivityDate': row[3],
                  'WhatId': accounts.get(row[4]),
                  'Priority': row[5],
                  'Status': row[6],
                  'OwnerId': users.get(row[9])})
-            logging.info(insertTasks)
+        logging.info("Read " + str(len(insertTasks)) + " Tasks")
     except Exception as ex:
         logError("Could not read Tasks", ex)
+    return insertTasks
+
+
+def createTasks(sf, users, wb, accounts, contacts):
+    """Creates Tasks in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the user to assign ownership of the Tasks to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        accounts (dict of string : string) -- the accounts to relate the Tasks to
+        contacts (dict of string : string) -- the contacts to relate the Tasks to
+
+    Returns:
+        void
+    """
+    ws = wb["Tasks"]
+    insertTasks = buildTasks(ws, users, accounts, contacts)
 
     try:
         logInfo("Creating Tasks")
-        Tasks = sf.bulk.Task.insert(insertTasks, batch_size=100)
+        insertRecords(sf, "Tasks", "Task", insertTasks)
         logInfo("Created Tasks")
-        logging.info(Tasks)
     except Exception as ex:
         logError("Could not create Tasks", ex)
 
 
-def createCases(sf, producers, wb, accounts, contacts):
-    """Creates Cases in the target org
+def buildCases(ws, producers, accounts, contacts):
+    """Reads Cases into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        users (dict of string : string) -- the user to assign ownership of the Cases to
-        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
-        accounts (dict of string : string) -- the accounts to relate the Cases to
-        contacts (dict of string : string) -- the contacts to relate the Cases to
+        ws (openpyxl.workbook.Worksheet) -- the worksheet to read the records from
+        producers (dict of string : string) -- the producers to relate the records to
+        accounts (dict of string : string) -- the accounts to relate the records to
+        contacts (dict of string : string) -- the contacts to relate the records to
 
     Returns:
-        void
+        insertCases (list of dict of string : any) -- the Cases to create
     """
-    ws = wb["Cases"]
     insertCases = []
     try:
         logInfo("Reading Cases")
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for rowNumber, row in iterSourceRows(ws):
             if (row[0] == None):
                 continue
             insertCases.append(
-                {'Type': row[0],
+                {SOURCE_ROW_FIELD: rowNumber, 'Type': row[0],
                  'Origin': row[1],
                  'EEP_Producer__c': producers.get(row[2]),
                  'ContactId': contacts.get(row[3]),
                  'Status': row[4],
                  'Priority': row[5],
                  'AccountId': accounts.get(row[6])})
-            logging.info(insertCases)
+        logging.info("Read " + str(len(insertCases)) + " Cases")
     except Exception as ex:
         logError("Could not read Cases", ex)
+    return insertCases
+
+
+def createCases(sf, producers, wb, accounts, contacts):
+    """Creates Cases in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        users (dict of string : string) -- the user to assign ownership of the Cases to
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        accounts (dict of string : string) -- the accounts to relate the Cases to
+        contacts (dict of string : string) -- the contacts to relate the Cases to
+
+    Returns:
+        void
+    """
+    ws = wb["Cases"]
+    insertCases = buildCases(ws, producers, accounts, contacts)
 
     try:
         logInfo("Creating Cases")
-        Cases = sf.bulk.Case.insert(insertCases, batch_size=100)
+        insertRecords(sf, "Cases", "Case", insertCases)
         logInfo("Created Cases")
-        logging.info(Cases)
     except Exception as ex:
         logError("Could not create Cases", ex)
 
 
-def createOperatingHours(sf):
-    """Creates OperatingHours in the target org
-
-    Parameters:
-        sf (Salesforce) -- the active Salesforce connection
+def buildOperatingHours():
+    """Reads OperatingHours into the records to create
 
     Returns:
-        OperatingHours (dict of string : string) -- a dictionary of the created OperatingHours with Name as the key and Id as the value
+        insertOperatingHours (list of dict of string : any) -- the OperatingHours to create
     """
     insertOperatingHours = []
     try:
@@ -724,25 +2376,36 @@ def createOperatingHours(sf):
         logging.info(insertOperatingHours)
     except Exception as ex:
         logError("Could not read OperatingHours", ex)
+    return insertOperatingHours
+
+
+def createOperatingHours(sf):
+    """Creates OperatingHours in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+
+    Returns:
+        OperatingHours (dict of string : string) -- a dictionary of the created OperatingHours with Name as the key and Id as the value
+    """
+    insertOperatingHours = buildOperatingHours()
     try:
         logInfo("Creating OperatingHours")
-        operatingHours = sf.bulk.OperatingHours.insert(insertOperatingHours, batch_size=100)
+        operatingHours = insertRecords(sf, "OperatingHours", "OperatingHours", insertOperatingHours)
         logInfo("Created OperatingHours")
-        logging.info(operatingHours)
-        return queryCreatedRecords(sf, operatingHours, "OperatingHours")
+        return queryCreatedRecords(sf, operatingHours.ids, "OperatingHours")
     except Exception as ex:
         logError("Could not create OperatingHours", ex)
 
 
-def createWorkType(sf, operatingHours):
-    """Creates WorkType in the target org
+def buildWorkType(operatingHours):
+    """Reads WorkType into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        operatingHours (dict of string : string) -- the operatingHours to relate the WorkType to
+        operatingHours (dict of string : string) -- the operatingHours to relate the records to
 
     Returns:
-        WorkType (dict of string : string) -- a dictionary of the created WorkType with Name as the key and Id as the value
+        insertWorkType (list of dict of string : any) -- the WorkType to create
     """
     insertWorkType = []
     try:
@@ -755,25 +2418,37 @@ def createWorkType(sf, operatingHours):
         logging.info(insertWorkType)
     except Exception as ex:
         logError("Could not read workType", ex)
+    return insertWorkType
+
+
+def createWorkType(sf, operatingHours):
+    """Creates WorkType in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        operatingHours (dict of string : string) -- the operatingHours to relate the WorkType to
+
+    Returns:
+        WorkType (dict of string : string) -- a dictionary of the created WorkType with Name as the key and Id as the value
+    """
+    insertWorkType = buildWorkType(operatingHours)
     try:
         logInfo("Creating WorkType")
-        workType = sf.bulk.WorkType.insert(insertWorkType, batch_size=100)
+        workType = insertRecords(sf, "WorkType", "WorkType", insertWorkType)
         logInfo("Created workType")
-        logging.info(workType)
-        return queryCreatedRecords(sf, workType, "WorkType")
+        return queryCreatedRecords(sf, workType.ids, "WorkType")
     except Exception as ex:
         logError("Could not create WorkType", ex)
 
 
-def createServiceTerritory(sf, operatingHours):
-    """Creates ServiceTerritory in the target org
+def buildServiceTerritory(operatingHours):
+    """Reads ServiceTerritory into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        operatingHours (dict of string : string) -- the operatingHours to relate the ServiceTerritory to
+        operatingHours (dict of string : string) -- the operatingHours to relate the records to
 
     Returns:
-        serviceTerritory (dict of string : string) -- a dictionary of the created serviceTerritory with Name as the key and Id as the value
+        insertServiceTerritory (list of dict of string : any) -- the ServiceTerritory to create
     """
     insertServiceTerritory = []
     try:
@@ -786,25 +2461,38 @@ def createServiceTerritory(sf, operatingHours):
         logging.info(insertServiceTerritory)
     except Exception as ex:
         logError("Could not read ServiceTerritory", ex)
+    return insertServiceTerritory
+
+
+def createServiceTerritory(sf, operatingHours):
+    """Creates ServiceTerritory in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        operatingHours (dict of string : string) -- the operatingHours to relate the ServiceTerritory to
+
+    Returns:
+        serviceTerritory (dict of string : string) -- a dictionary of the created serviceTerritory with Name as the key and Id as the value
+    """
+    insertServiceTerritory = buildServiceTerritory(operatingHours)
     try:
         logInfo("Creating ServiceTerritory")
-        serviceTerritory = sf.bulk.ServiceTerritory.insert(insertServiceTerritory, batch_size=100)
+        serviceTerritory = insertRecords(sf, "ServiceTerritory", "ServiceTerritory", insertServiceTerritory)
         logInfo("Created ServiceTerritory")
-        logging.info(serviceTerritory)
-        return queryCreatedRecords(sf, serviceTerritory, "serviceTerritory")
+        return queryCreatedRecords(sf, serviceTerritory.ids, "serviceTerritory")
     except Exception as ex:
         logError("Could not create ServiceTerritory", ex)
 
 
-def createServiceTerritoryWorkType(sf, serviceTerritory, workType):
-    """Creates ServiceTerritory in the target org
+def buildServiceTerritoryWorkType(serviceTerritory, workType):
+    """Reads ServiceTerritoryWorkType into the records to create
 
     Parameters:
-        sf (Salesforce) -- the active Salesforce connection
-        serviceTerritory (dict of string : string) -- the serviceTerritory to relate the ServiceTerritoryWorkType to
+        serviceTerritory (dict of string : string) -- the serviceTerritory to relate the records to
+        workType (dict of string : string) -- the workType to relate the records to
 
     Returns:
-        void
+        insertServiceTerritoryWorkType (list of dict of string : any) -- the ServiceTerritoryWorkType to create
     """
     insertServiceTerritoryWorkType = []
     try:
@@ -815,23 +2503,33 @@ def createServiceTerritoryWorkType(sf, serviceTerritory, workType):
         logging.info(insertServiceTerritoryWorkType)
     except Exception as ex:
         logError("Could not read ServiceTerritoryWorkType", ex)
+    return insertServiceTerritoryWorkType
+
+
+def createServiceTerritoryWorkType(sf, serviceTerritory, workType):
+    """Creates ServiceTerritory in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        serviceTerritory (dict of string : string) -- the serviceTerritory to relate the ServiceTerritoryWorkType to
+
+    Returns:
+        void
+    """
+    insertServiceTerritoryWorkType = buildServiceTerritoryWorkType(serviceTerritory, workType)
     try:
         logInfo("Creating ServiceTerritoryWorkType")
-        serviceTerritoryWorkType = sf.bulk.ServiceTerritoryWorkType.insert(insertServiceTerritoryWorkType, batch_size=100)
+        insertRecords(sf, "ServiceTerritoryWorkType", "ServiceTerritoryWorkType", insertServiceTerritoryWorkType)
         logInfo("Created ServiceTerritoryWorkType")
-        logging.info(serviceTerritoryWorkType)
     except Exception as ex:
         logError("Could not create ServiceTerritoryWorkType", ex)
 
 
-def createWorkTypeGroup(sf):
-    """Creates WorkTypeGroup in the target org
-
-    Parameters:
-        sf (Salesforce) -- the active Salesforce connection
+def buildWorkTypeGroup():
+    """Reads WorkTypeGroup into the records to create
 
     Returns:
-        void
+        insertWorkTypeGroup (list of dict of string : any) -- the WorkTypeGroup to create
     """
     insertWorkTypeGroup = []
     try:
@@ -843,15 +2541,727 @@ def createWorkTypeGroup(sf):
         logging.info(insertWorkTypeGroup)
     except Exception as ex:
         logError("Could not read WorkTypeGroup", ex)
+    return insertWorkTypeGroup
+
+
+def createWorkTypeGroup(sf):
+    """Creates WorkTypeGroup in the target org
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+
+    Returns:
+        void
+    """
+    insertWorkTypeGroup = buildWorkTypeGroup()
     try:
         logInfo("Creating WorkTypeGroup")
-        WorkTypeGroup = sf.bulk.WorkTypeGroup.insert(insertWorkTypeGroup, batch_size=100)
+        insertRecords(sf, "WorkTypeGroup", "WorkTypeGroup", insertWorkTypeGroup)
         logInfo("Created WorkTypeGroup")
-        logging.info(WorkTypeGroup)
     except Exception as ex:
         logError("Could not create WorkTypeGroup", ex)
 
 
+def apiShare(value):
+    """Reads the --api-share argument as the share of the org's remaining requests and batches the run may use
+
+    Parameters:
+        value (string) -- the argument
+
+    Returns:
+        (float) -- the share, more than 0 and at most 1
+    """
+    try:
+        share = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("must be a fraction like 0.5")
+    if not 0 < share <= 1:
+        raise argparse.ArgumentTypeError("must be more than 0 and at most 1")
+    return share
+
+
+def stageList(value):
+    """Reads the --stages argument as a list of stage names
+
+    Parameters:
+        value (string) -- the argument
+
+    Returns:
+        stages (list of string) -- the stage names
+    """
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in dict(LOAD_STAGES)]
+    if not stages or unknown:
+        raise argparse.ArgumentTypeError("stages must be some of " + ", ".join(stage for stage, sobject in LOAD_STAGES))
+    return stages
+
+
+def sampleSize(value):
+    """Reads the --sample argument as a fraction of the rows when it has a decimal point, otherwise a number of rows
+
+    Parameters:
+        value (string) -- the argument
+
+    Returns:
+        (float or integer) -- the fraction or number of rows
+    """
+    try:
+        size = float(value) if "." in value else int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("must be a fraction like 0.05 or a number of rows like 50")
+    if size <= 0 or (isinstance(size, float) and size > 1):
+        raise argparse.ArgumentTypeError("must be a fraction between 0 and 1 or a positive number of rows")
+    return size
+
+
+def sampleWorkbook(wb, size):
+    """Picks a subset of the rows of each sheet, along with every row they refer to directly or indirectly
+
+    Every sheet is read once to index its rows by Name. The rows picked are spread evenly through each sheet. Then each
+    sheet, in SAMPLE_ORDER, adds the rows its picked rows refer to, so every sampled Case still finds its Producer,
+    Contact and Account and every record still finds its owner.
+
+    Parameters:
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        size (float or integer) -- the fraction or number of rows to pick from each sheet
+
+    Returns:
+        (ParsedWorkbook) -- the header and sampled rows of each sheet
+    """
+    try:
+        logInfo("Sampling workbook")
+        rows = dict()
+        for ws in wb.worksheets:
+            rows[ws.title] = list(ws.iter_rows(values_only=True))
+
+        index = dict()
+        for lookup, sheets in SAMPLE_LOOKUP_SHEETS.items():
+            keys = index[lookup] = dict()
+            for sheet in sheets:
+                for i, row in enumerate(rows.get(sheet, [])[1:], 1):
+                    if (row[0] != None):
+                        keys.setdefault(getRecordName(row, NAME_COLUMNS.get(sheet)), []).append((sheet, i))
+
+        picked = dict()
+        for sheet, sheetRows in rows.items():
+            valid = [i for i, row in enumerate(sheetRows[1:], 1) if row and row[0] != None]
+            count = min(len(valid), math.ceil(size * len(valid)) if isinstance(size, float) else size)
+            picked[sheet] = set(valid[int(n * len(valid) / count)] for n in range(count)) if count else set()
+
+        pulledIn = dict((sheet, 0) for sheet in rows)
+        for sheet in SAMPLE_ORDER:
+            # Rows pulled into the sheet being walked (i.e. a Child Account's parent) are walked too
+            pending = sorted(picked.get(sheet, set()))
+            while pending:
+                i = pending.pop()
+                for col, lookup in SAMPLE_REFERENCES.get(sheet, []):
+                    for target, j in index.get(lookup).get(rows[sheet][i][col], []):
+                        if j not in picked[target]:
+                            picked[target].add(j)
+                            pulledIn[target] += 1
+                            if target == sheet:
+                                pending.append(j)
+
+        worksheets = []
+        for sheet, sheetRows in rows.items():
+            logInfo("Sampled " + str(len(picked[sheet])) + " of " + str(len(sheetRows) - 1) + " " + sheet + " rows (" +
+                    str(pulledIn[sheet]) + " referred to by other rows)")
+            worksheets.append(ParsedSheet(sheet, sheetRows[:1] + [sheetRows[i] for i in sorted(picked[sheet])],
+                                          [1] + [i + 1 for i in sorted(picked[sheet])]))
+        return ParsedWorkbook(worksheets)
+    except Exception as ex:
+        logError("Could not sample workbook", ex)
+
+
+def getWorkbookIds(sf, wb, stage, sobject):
+    """Queries the ids of the records in the org with the same names as the records in a stage's worksheet
+
+    ServiceTerritoryWorkType has no Name, so it's found by the fixed names of the work type and service territory it
+    links instead.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data that was loaded
+        stage (string) -- the load stage whose records to find
+        sobject (string) -- the object the records are of
+
+    Returns:
+        recordIds (list of string) -- the ids of the records with matching names
+    """
+    if stage == "ServiceTerritoryWorkType":
+        try:
+            records = querySalesforce(sf, format_soql(
+                "SELECT Id FROM ServiceTerritoryWorkType WHERE WorkType.Name = {workType} AND "
+                "ServiceTerritory.Name = {territory}", workType=TEARDOWN_STATIC_NAMES.get("WorkType"),
+                territory=TEARDOWN_STATIC_NAMES.get("ServiceTerritory")))
+        except Exception as ex:
+            logError("Could not query " + stage + " to delete", ex)
+        return [r.get('Id') for r in records.get('records')]
+    # Keeps every id, since more than one record may have the same name
+    return [r.get('Id') for r in queryRecords(sf, sobject, "Name", getWorkbookNames(wb, stage))]
+
+
+def getWorkbookNames(wb, stage):
+    """Gets the names of a stage's records from its worksheet, or the fixed name of a stage without one
+
+    Parameters:
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data
+        stage (string) -- the load stage whose record names to get
+
+    Returns:
+        (list of string) -- the names, sorted
+    """
+    names = set()
+    if stage in NAME_COLUMNS:
+        if stage not in wb.sheetnames:
+            return []
+        columns = NAME_COLUMNS.get(stage)
+        try:
+            for row in wb[stage].iter_rows(min_row=2, values_only=True):
+                if (row[0] == None):
+                    continue
+                names.add(getRecordName(row, columns))
+        except Exception as ex:
+            logError("Could not read " + stage + " names from worksheet", ex)
+    elif stage in TEARDOWN_STATIC_NAMES:
+        names.add(TEARDOWN_STATIC_NAMES.get(stage))
+    return sorted(names)
+
+
+def getRecordName(row, columns):
+    """Gets the Name a record is referred to by from its worksheet row
+
+    Parameters:
+        row (tuple) -- the values of the worksheet row
+        columns (tuple of integer) -- the columns (counting from 0) that make up the Name
+
+    Returns:
+        (string) -- the values of the columns separated by spaces
+    """
+    return " ".join(str(row[col]) for col in columns if row[col] is not None)
+
+
+def teardown(sf, wb, hardDelete, stages):
+    """Deletes previously loaded test data in reverse dependency order
+
+    The ids recorded by previous runs are used for each stage that has them. Otherwise the records are found by the
+    names in the workbook, or for ServiceTerritoryWorkType by the work type and service territory it links, and Tasks and
+    Cases are left to be deleted along with their Accounts. Users are never deleted.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data that was loaded
+        hardDelete (boolean) -- whether to hard delete the records instead of moving them to the recycle bin
+        stages (list of string) -- the stages to delete the records of
+
+    Returns:
+        void
+    """
+    operation = "hard_delete" if hardDelete else "delete"
+    loaded = loadLoadedIds(sf)
+    for stage, sobject in TEARDOWN_STAGES:
+        if stage not in stages:
+            continue
+        recordIds = loaded.get(stage, {}).get('ids')
+        if not recordIds:
+            recordIds = getWorkbookIds(sf, wb, stage, sobject)
+        if not recordIds:
+            continue
+        try:
+            logInfo("Deleting " + str(len(recordIds)) + " " + stage)
+            results = submitRecords(sf, operation, sobject, [{'Id': i} for i in recordIds], TEARDOWN_BATCH_SIZE)
+        except Exception as ex:
+            logError("Could not delete " + stage, ex)
+
+        deleted = []
+        for recordId, result in zip(recordIds, flattenResults(results)):
+            errors = result.get('errors') or []
+            # Records deleted along with their parent earlier in the teardown are already gone
+            if result.get('success') or any(e.get('statusCode') == 'ENTITY_IS_DELETED' for e in errors):
+                deleted.append(recordId)
+                continue
+            logging.warning("Could not delete " + stage + " record " + recordId + ": " + str(errors))
+        logInfo("Deleted " + str(len(deleted)) + " " + stage +
+                ("" if len(deleted) == len(recordIds) else
+                 ", " + str(len(recordIds) - len(deleted)) + " could not be deleted"))
+        forgetLoadedIds(sf, stage, deleted)
+
+
+def buildCalibrationRecords(wb, stage):
+    """Reads the first rows of a stage's worksheet into records with no lookups, to use as calibration templates
+
+    Parameters:
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data
+        stage (string) -- the load stage whose worksheet to read
+
+    Returns:
+        (list of dict of string : any) -- the records, or an empty list for stages that can't be calibrated
+    """
+    empty = dict()
+    builders = {"ParentAccounts": lambda ws: buildParentAccounts(ws, empty, empty),
+                "ChildAccounts": lambda ws: buildChildAccounts(ws, empty, empty, empty),
+                "PersonAccounts": lambda ws: buildPersonAccounts(ws, empty, empty),
+                "Contacts": lambda ws: buildContacts(ws, empty, empty),
+                "Producers": lambda ws: buildProducers(ws, empty, empty, empty),
+                "Leads": lambda ws: buildLeads(ws, empty, empty, empty),
+                "Opportunities": lambda ws: buildOpportunities(ws, empty, empty, empty),
+                "Tasks": lambda ws: buildTasks(ws, empty, empty, empty),
+                "Cases": lambda ws: buildCases(ws, empty, empty, empty)}
+    if stage not in builders or stage not in wb.sheetnames:
+        return []
+    ws = wb[stage]
+    templates = builders.get(stage)(ParsedSheet(stage, list(ws.iter_rows(max_row=CALIBRATION_TEMPLATE_ROWS + 1,
+                                                                          values_only=True))))
+    for record in templates:
+        record.pop(SOURCE_ROW_FIELD, None)
+    return templates
+
+
+def calibrate(sf, wb, stages):
+    """Times loading each stage's sObject with every combination of the calibration settings and saves the best
+
+    Each trial loads CALIBRATION_ROWS records copied from the first rows of the stage's worksheet and hard deletes them
+    again. Their ids are recorded like a load's until they're deleted, so a teardown finds any a stopped run leaves. The
+    fastest setting whose share of row lock failures is at most CALIBRATION_MAX_LOCK_RATE is saved to the
+    org's load profile, which later loads of the sObject use. Users and the stages without a worksheet are skipped.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data
+        stages (list of string) -- the stages whose sObjects to calibrate
+
+    Returns:
+        void
+    """
+    profile = loadLoadProfile(sf)
+    calibrated = set()
+    settings = [(batchSize, True, 1) for batchSize in CALIBRATION_BATCH_SIZES] + \
+               [(batchSize, False, concurrency) for batchSize in CALIBRATION_BATCH_SIZES
+                for concurrency in CALIBRATION_CONCURRENCY
+                # Leaves out concurrency the payload is too small to give every job a batch of, so it isn't measured
+                # as fewer jobs than it would run with
+                if batchSize * concurrency <= CALIBRATION_ROWS]
+    for stage, sobject in LOAD_STAGES:
+        if stage not in stages or sobject in calibrated:
+            continue
+        templates = buildCalibrationRecords(wb, stage)
+        if not templates:
+            continue
+        calibrated.add(sobject)
+        records = prepareRecords(sf, [templates[i % len(templates)] for i in range(CALIBRATION_ROWS)], sobject)
+
+        trials = []
+        for batchSize, serial, concurrency in settings:
+            try:
+                logInfo("Calibrating " + sobject + " with batches of " + str(batchSize) + " in " +
+                        ("serial mode" if serial else "parallel mode, " + str(concurrency) + " jobs at once"))
+                started = time.monotonic()
+                results = flattenResults(submitRecords(sf, "insert", sobject, records, batchSize, None, serial,
+                                                       concurrency))
+                elapsed = max(time.monotonic() - started, 0.001)
+            except Exception as ex:
+                logError("Could not calibrate " + sobject, ex)
+
+            createdIds = [r.get('id') for r in results if r.get('success') and r.get('id') is not None]
+            if createdIds:
+                recordLoadedIds(sf, stage, sobject, createdIds)
+            try:
+                lockFailures = sum(1 for r in results
+                                   if any(e.get('statusCode') == 'UNABLE_TO_LOCK_ROW' for e in r.get('errors') or []))
+                trial = {'batchSize': batchSize, 'serial': serial, 'concurrency': concurrency,
+                         'recordsPerSecond': round(len(createdIds) / elapsed, 1),
+                         'lockFailureRate': round(lockFailures / max(len(results), 1), 4)}
+                # Only trials that created records measured anything
+                if createdIds:
+                    trials.append(trial)
+                elif results:
+                    logging.warning("No " + sobject + " calibration records were created: " +
+                                    str(results[0].get('errors')))
+                logInfo("Created " + str(len(createdIds)) + " of " + str(len(records)) + " " + sobject + " at " +
+                        str(trial.get('recordsPerSecond')) + " records per second, " + str(lockFailures) +
+                        " row lock failures")
+            finally:
+                deleteCalibrationRecords(sf, stage, sobject, createdIds)
+
+        if not trials:
+            logInfo("Not saving settings for " + sobject + " since no trial created any records, check log file for "
+                    "the errors")
+            continue
+        allowed = [t for t in trials if t.get('lockFailureRate') <= CALIBRATION_MAX_LOCK_RATE]
+        if allowed:
+            best = max(allowed, key=lambda t: t.get('recordsPerSecond'))
+        else:
+            best = min(trials, key=lambda t: (t.get('lockFailureRate'), -t.get('recordsPerSecond')))
+        profile[sobject] = dict(best, calibrated=datetime.datetime.now().isoformat())
+        saveLoadProfile(sf, profile)
+        logInfo("Calibrated " + sobject + ": batches of " + str(best.get('batchSize')) + " in " +
+                ("serial mode" if best.get('serial') else
+                 "parallel mode, " + str(best.get('concurrency')) + " jobs at once"))
+
+
+def deleteCalibrationRecords(sf, stage, sobject, recordIds):
+    """Deletes a calibration trial's records, hard deleting them so they don't fill the recycle bin when the user has
+    the Bulk API Hard Delete permission
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        stage (string) -- the load stage the records' ids were recorded under
+        sobject (string) -- the object the records are of
+        recordIds (list of string) -- the ids of the created records
+
+    Returns:
+        void
+    """
+    if not recordIds:
+        return
+    records = [{'Id': i} for i in recordIds]
+    try:
+        try:
+            results = submitRecords(sf, "hard_delete", sobject, records, TEARDOWN_BATCH_SIZE)
+        except Exception as ex:
+            logging.warning("Could not hard delete " + sobject + " calibration records, deleting them instead: " +
+                            str(ex))
+            results = submitRecords(sf, "delete", sobject, records, TEARDOWN_BATCH_SIZE)
+    except Exception as ex:
+        logError("Could not delete " + sobject + " calibration records, run with --teardown to delete them", ex)
+
+    deleted = [i for i, r in zip(recordIds, flattenResults(results)) if r.get('success')]
+    forgetLoadedIds(sf, stage, deleted)
+    if len(deleted) < len(recordIds):
+        logging.warning("Could not delete " + str(len(recordIds) - len(deleted)) + " " + sobject +
+                        " calibration records, run with --teardown to delete them")
+
+
+def getBatchWorkbooks(path):
+    """Lists the workbooks to load in batch mode
+
+    Parameters:
+        path (string) -- a directory of workbooks, or a file listing one workbook per line relative to the file
+
+    Returns:
+        workbooks (list of string) -- the paths to the workbooks
+    """
+    workbooks = []
+    try:
+        if os.path.isdir(path):
+            # Skips the lock files Excel leaves next to open workbooks
+            workbooks = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(".xlsx") and not name.startswith("~$")]
+        else:
+            with open(path) as manifestFile:
+                for line in manifestFile:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        workbooks.append(os.path.join(os.path.dirname(path), line))
+    except Exception as ex:
+        logError("Could not list the workbooks in " + path, ex)
+    if not workbooks:
+        logError("Could not list the workbooks in " + path, Exception("No workbooks found"))
+    return workbooks
+
+
+def runBatch(sf, args, stages):
+    """Loads several workbooks with one login, describe cache and HTTP pool, several workbooks at a time
+
+    Workbooks are parsed one after another into a bounded queue that BATCH_WORKERS threads take them from, so the next
+    workbooks are being parsed while earlier ones load and the stages of different workbooks run at the same time.
+    Each workbook's results files are written to its own directory under RESULTS_DIRECTORY.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        args (argparse.Namespace) -- the parsed command line arguments
+        stages (list of string) -- the stages selected to run for each workbook
+
+    Returns:
+        void
+    """
+    workbooks = getBatchWorkbooks(args.filePath)
+    logInfo("Loading " + str(len(workbooks)) + " workbooks, " + str(BATCH_WORKERS) + " at a time")
+    started = time.monotonic()
+    report = dict()
+    work = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            path, wb, parseSeconds = item
+            report[path] = dict(loadQueuedWorkbook(sf, path, wb, args, stages), parseSeconds=parseSeconds)
+
+    workers = [threading.Thread(target=worker) for _ in range(min(BATCH_WORKERS, len(workbooks)))]
+    for thread in workers:
+        thread.start()
+    for path in workbooks:
+        parseStarted = time.monotonic()
+        try:
+            wb = loadWorkbook(path, args.parallelParse)
+            if args.sample:
+                sampled = sampleWorkbook(wb, args.sample)
+                wb.close()
+                wb = sampled
+        except (Exception, SystemExit):
+            # loadWorkbook has logged why and exits, which only fails this workbook
+            report[path] = {'failure': "could not be read", 'parseSeconds': time.monotonic() - parseStarted,
+                            'loadSeconds': 0}
+            continue
+        work.put((path, wb, time.monotonic() - parseStarted))
+    for thread in workers:
+        work.put(None)
+    for thread in workers:
+        thread.join()
+
+    logInfo("Batch report:")
+    for path in workbooks:
+        result = report.get(path)
+        timing = ("parsed in " + str(round(result.get('parseSeconds'), 1)) + "s, loaded in " +
+                  str(round(result.get('loadSeconds'), 1)) + "s")
+        logInfo("  " + os.path.basename(path) + ": " +
+                ("FAILED, " + result.get('failure') if result.get('failure') else "loaded") + " (" + timing + ")")
+    failed = sum(1 for result in report.values() if result.get('failure'))
+    logInfo("Loaded " + str(len(workbooks) - failed) + " of " + str(len(workbooks)) + " workbooks in " +
+            str(round(time.monotonic() - started, 1)) + "s" + ("" if not failed else ", see result.log for failures"))
+
+
+def loadQueuedWorkbook(sf, path, wb, args, stages):
+    """Loads one workbook of a batch on the current worker thread, catching its failure so the batch carries on
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        path (string) -- the path to the workbook
+        wb (openpyxl.workbook.Workbook) -- the parsed workbook
+        args (argparse.Namespace) -- the parsed command line arguments
+        stages (list of string) -- the stages selected to run
+
+    Returns:
+        (dict of string : any) -- the seconds the load took and why it failed, or None when it didn't
+    """
+    loadContext.workbook = os.path.abspath(path)
+    loadContext.resultsDirectory = os.path.join(RESULTS_DIRECTORY, os.path.splitext(os.path.basename(path))[0])
+    loadContext.stage = None
+    started = time.monotonic()
+    failure = None
+    logInfo("Loading " + path)
+    try:
+        runLoad(sf, wb, args, stages)
+    except (Exception, SystemExit) as ex:
+        # logError has already logged the cause before exiting the worker's load
+        failure = "stopped in " + (loadContext.stage or "planning") + " stage"
+        if not isinstance(ex, SystemExit):
+            logging.error(ex)
+    finally:
+        wb.close()
+    return {'loadSeconds': time.monotonic() - started, 'failure': failure}
+
+
+class PlaceholderMap:
+    """Stands in for a lookup map while compiling, giving a placeholder for each name to be resolved when pushing"""
+
+    def __init__(self, kind):
+        """
+        Parameters:
+            kind (string) -- the lookup the names are resolved with (i.e. users, accounts, RecordType.Account)
+        """
+        self.kind = kind
+
+    def get(self, name):
+        """Gets the placeholder for a name, or None when there is no name like a lookup map would"""
+        return None if name is None else "{{" + self.kind + ":" + str(name) + "}}"
+
+
+def compileWorkbook(wb, outputDirectory):
+    """Compiles the workbook into payload files for each stage, with placeholders for the lookups between records
+
+    Each stage's records are written as JSON lines files of up to COMPILE_SHARD_ROWS records, and manifest.json lists
+    the stages in load order with the lookup maps that each one's created records are added to.
+
+    Parameters:
+        wb (openpyxl.workbook.Workbook) -- the workbook containing the test data to create
+        outputDirectory (string) -- the directory to write the payload files to
+
+    Returns:
+        void
+    """
+    users = PlaceholderMap("users")
+    accounts = PlaceholderMap("accounts")
+    contacts = PlaceholderMap("contacts")
+    # The stage, sObject, lookup maps the created records are added to and the records to create, in load order
+    stages = [
+        ("Users", "User", ["users"],
+         lambda: buildUsers(wb["Users"], "", PlaceholderMap("Profile"), PlaceholderMap("UserRole"))),
+        ("ParentAccounts", "Account", ["parentAccounts", "accounts"],
+         lambda: buildParentAccounts(wb["ParentAccounts"], users, PlaceholderMap("RecordType.Account"))),
+        ("ChildAccounts", "Account", ["parentAccounts", "accounts"],
+         lambda: [buildChildAccounts(level, users, PlaceholderMap("parentAccounts"),
+                                     PlaceholderMap("RecordType.Account"))
+                  for level in levelChildAccounts(wb["ChildAccounts"])]),
+        ("PersonAccounts", "Account", ["accounts"],
+         lambda: buildPersonAccounts(wb["PersonAccounts"], users, PlaceholderMap("RecordType.Account"))),
+        ("Contacts", "Contact", ["contacts"],
+         lambda: buildContacts(wb["Contacts"], users, PlaceholderMap("RecordType.Contact"))),
+        ("Producers", "Producer", ["producers"],
+         lambda: buildProducers(wb["Producers"], users, accounts, contacts)),
+        ("Leads", "Lead", [],
+         lambda: buildLeads(wb["Leads"], users, accounts, PlaceholderMap("RecordType.Lead"))),
+        ("Opportunities", "Opportunity", [],
+         lambda: buildOpportunities(wb["Opportunities"], users, accounts, PlaceholderMap("RecordType.Opportunity"))),
+        ("Tasks", "Task", [],
+         lambda: buildTasks(wb["Tasks"], users, accounts, contacts)),
+        ("Cases", "Case", [],
+         lambda: buildCases(wb["Cases"], PlaceholderMap("producers"), accounts, contacts)),
+        ("OperatingHours", "OperatingHours", ["operatingHours"], lambda: buildOperatingHours()),
+        ("WorkType", "WorkType", ["workType"], lambda: buildWorkType(PlaceholderMap("operatingHours"))),
+        ("ServiceTerritory", "ServiceTerritory", ["serviceTerritory"],
+         lambda: buildServiceTerritory(PlaceholderMap("operatingHours"))),
+        ("ServiceTerritoryWorkType", "ServiceTerritoryWorkType", [],
+         lambda: buildServiceTerritoryWorkType(PlaceholderMap("serviceTerritory"), PlaceholderMap("workType"))),
+        ("WorkTypeGroup", "WorkTypeGroup", [], lambda: buildWorkTypeGroup()),
+    ]
+
+    manifest = {'compiled': datetime.datetime.now().isoformat(), 'stages': []}
+    try:
+        os.makedirs(outputDirectory, exist_ok=True)
+        for stage, sobject, maps, build in stages:
+            # Child accounts are built a level of the hierarchy at a time, and no shard mixes levels so a level's
+            # parents have all been pushed before it
+            levels = build() if stage == "ChildAccounts" else [build()]
+            records = sum(len(level) for level in levels)
+            logInfo("Compiling " + str(records) + " " + stage)
+            shards = []
+            for level in levels:
+                for i in range(0, len(level), COMPILE_SHARD_ROWS):
+                    shard = stage + "-" + str(len(shards)).zfill(5) + ".jsonl"
+                    with open(os.path.join(outputDirectory, shard), "w") as shardFile:
+                        for record in level[i:i + COMPILE_SHARD_ROWS]:
+                            shardFile.write(json.dumps(record, default=lambda value: value.isoformat()) + "\n")
+                    shards.append(shard)
+            manifest['stages'].append({'stage': stage, 'sobject': sobject, 'maps': maps, 'records': records,
+                                       'shards': shards})
+        with open(os.path.join(outputDirectory, "manifest.json"), "w") as manifestFile:
+            json.dump(manifest, manifestFile, indent=2)
+        logInfo("Compiled payloads to " + outputDirectory)
+    except Exception as ex:
+        logError("Could not compile payloads", ex)
+
+
+def readShard(directory, shard):
+    """Reads the records of a compiled payload file
+
+    Parameters:
+        directory (string) -- the directory of the compiled payloads
+        shard (string) -- the payload file name
+
+    Returns:
+        (list of dict of string : any) -- the records in the file
+    """
+    with open(os.path.join(directory, shard)) as shardFile:
+        return [json.loads(line) for line in shardFile if line.strip()]
+
+
+def queryLookupNames(sf, kind, names):
+    """Queries the ids of org metadata referenced by name in compiled payloads
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        kind (string) -- Profile, UserRole or RecordType. followed by the object
+        names (list of string) -- the names to look up
+
+    Returns:
+        (dict of string : string) -- the ids by name
+    """
+    try:
+        logInfo("Querying " + kind + " names")
+        if kind.startswith("RecordType."):
+            q = format_soql(
+                "SELECT Id, Name FROM RecordType WHERE SobjectType = {obj} AND IsActive = TRUE AND Name IN {names}",
+                obj=kind.split(".", 1)[1], names=names)
+        else:
+            q = format_soql("SELECT Id, Name FROM " + kind + " WHERE Name IN {names}", names=names)
+        return createRecordMap(querySalesforce(sf, q), kind)
+    except Exception as ex:
+        logError("Could not query " + kind + " names", ex)
+
+
+def resolvePlaceholders(sf, records, lookups):
+    """Replaces the placeholders in compiled records with ids, querying org metadata the first time it is needed
+
+    Placeholders for records that haven't been created are left out, the same as a failed lookup when loading a
+    workbook directly.
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        records (list of dict of string : any) -- the compiled records
+        lookups (dict of string : dict of string : string) -- the ids by name for each lookup, added to as needed
+
+    Returns:
+        resolved (list of dict of string : any) -- the records with ids in place of the placeholders
+    """
+    missing = dict()
+    for record in records:
+        for value in record.values():
+            match = PLACEHOLDER_PATTERN.match(value) if isinstance(value, str) else None
+            if match and match.group(1) not in lookups:
+                missing.setdefault(match.group(1), set()).add(match.group(2))
+    for kind, names in missing.items():
+        if kind in ("Profile", "UserRole") or kind.startswith("RecordType."):
+            lookups[kind] = queryLookupNames(sf, kind, sorted(names))
+
+    resolved = []
+    for record in records:
+        resolvedRecord = dict()
+        for key, value in record.items():
+            match = PLACEHOLDER_PATTERN.match(value) if isinstance(value, str) else None
+            resolvedRecord[key] = lookups.get(match.group(1), {}).get(match.group(2)) if match else value
+        resolved.append(resolvedRecord)
+    return resolved
+
+
+def pushCompiled(sf, directory, createOrQuery):
+    """Loads compiled payloads into the org stage by stage, resolving each stage's lookups from the earlier stages
+
+    Parameters:
+        sf (Salesforce) -- the active Salesforce connection
+        directory (string) -- the directory of the compiled payloads
+        createOrQuery (string) -- True to create the users, False to query them
+
+    Returns:
+        void
+    """
+    try:
+        with open(os.path.join(directory, "manifest.json")) as manifestFile:
+            manifest = json.load(manifestFile)
+    except Exception as ex:
+        logError("Could not read compiled payloads", ex)
+
+    limitTracker.planLoad(dict((s.get('stage'), s.get('records')) for s in manifest.get('stages')))
+    lookups = dict()
+    for stage in manifest.get('stages'):
+        name = stage.get('stage')
+        if name == "Users" and createOrQuery.lower() != "true":
+            userNames = []
+            for shard in stage.get('shards'):
+                userNames.extend(r.get('FirstName') + " " + r.get('LastName') for r in readShard(directory, shard)
+                                 if r.get('FirstName') != None and r.get('LastName') != None)
+            lookups['users'] = queryUsersByName(sf, userNames)
+            continue
+
+        try:
+            logInfo("Creating " + str(stage.get('records')) + " " + name)
+            for shard in stage.get('shards'):
+                records = resolvePlaceholders(sf, readShard(directory, shard), lookups)
+                if name == "Users":
+                    suffix = getUsernameSuffix(sf)
+                    for record in records:
+                        record['Username'] = record.get('Username') + suffix
+                results = insertRecords(sf, name, stage.get('sobject'), records)
+                if stage.get('maps'):
+                    created = queryCreatedRecords(sf, results.ids, stage.get('sobject'))
+                    for lookup in stage.get('maps'):
+                        lookups.setdefault(lookup, dict()).update(created)
+            logInfo("Created " + name)
+        except Exception as ex:
+            logError("Could not create " + name, ex)
+
 
 if __name__ == '__main__':
     main()